@@ -4,10 +4,41 @@ import groq_brain
 import system_monitor
 import toolbox_db
 import toolbox_logger
+import tool_expander
+import prompt_budget
+import model_router
 
 # Configuration
 STORAGE_DIR = "execution_files"
 os.makedirs(STORAGE_DIR, exist_ok=True)
+# "eager": Stage 4 flattens call_tool into primitives.
+# "lazy": the plan keeps call_tool nodes and the executor expands them just-in-time.
+EXPANSION_MODE = os.getenv("TOOL_EXPANSION_MODE", "eager")
+# "suffix": Stage 5 regenerates only the failed step onward and execution resumes there.
+# "full": Stage 5 rewrites the whole plan and execution restarts from step 1.
+FIX_MODE = os.getenv("STAGE5_FIX_MODE", "suffix")
+
+class StageError(RuntimeError):
+    """A stage got no usable answer from the model; the pipeline stops instead of carrying None forward."""
+
+def _require(result, stage, task=None):
+    """Stops on a missing answer, or (given the router task) one that is empty / the wrong shape."""
+    validate = model_router.VALIDATORS.get(task) if task else None
+    if result is None or (validate and not validate(result)):
+        raise StageError(f"{stage} failed: no valid response from the model")
+    return result
+
+def summarize_steps(steps, max_value=60):
+    """One short line per completed step (action + key params) instead of full JSON."""
+    if not steps:
+        return "(none)"
+    lines = []
+    for i, step in enumerate(steps, 1):
+        if not isinstance(step, dict):
+            continue
+        args = ", ".join(f"{k}={str(v)[:max_value]}" for k, v in step.items() if k != "action")
+        lines.append(f"{i}. {step.get('action')}({args})")
+    return "\n".join(lines)
 
 class AgentCompiler:
     """
@@ -16,7 +47,10 @@ class AgentCompiler:
     """
     def __init__(self):
         self.db = toolbox_db.ToolboxDB()
-        self.model = os.getenv("GROQ_MODEL", "openai/gpt-oss-120b")
+        # Model per stage (small/large tiers, escalation on invalid output)
+        self.router = model_router.get_router()
+        self.expander = None
+        self.expander_source = None
 
     # --- STAGE 1: THE ARCHITECT ---
     def stage_1_main_breakdown(self, user_goal):
@@ -34,7 +68,7 @@ Output ONLY a JSON list of descriptions.
 Example: ["Open Browser", "Search for Nvidia", "Extract Price", "Save to Notes"]
 """
         print("   🧠 [Stage 1] Breaking down task...")
-        result = groq_brain.get_action_plan(prompt, model_id=self.model)
+        result = _require(self.router.call("stage_1", lambda model: groq_brain.get_action_plan(prompt, model_id=model, stage="stage_1")), "Stage 1", "stage_1")
         return toolbox_logger.save_stage_file("1_main_breakdown.json", result)
 
     # --- STAGE 2: SEMANTIC EXPANSION ---
@@ -48,7 +82,7 @@ Output ONLY a JSON list of words.
 Example: ["nvidia", "stock", "price", "notes", "finance", "fetch", "save"]
 """
         print("   🧠 [Stage 2] Generating search keywords...")
-        result = groq_brain.get_action_plan(prompt, model_id=self.model)
+        result = _require(self.router.call("stage_2", lambda model: groq_brain.get_action_plan(prompt, model_id=model, stage="stage_2")), "Stage 2", "stage_2")
         return toolbox_logger.save_stage_file("2_semantic_search.json", result)
 
     # --- STAGE 3: TOOL RETRIEVAL (Python Logic) ---
@@ -75,15 +109,21 @@ Example: ["nvidia", "stock", "price", "notes", "finance", "fetch", "save"]
         return toolbox_logger.save_stage_file("3_available_tools.json", detailed_tools)
 
     # --- STAGE 4: COMPOSITION ---
-    def stage_4_final_execution(self, user_goal):
-        """Composes and EXPANDS the final plan."""
+    def stage_4_final_execution(self, user_goal, on_step=None, on_restart=None):
+        """
+        Composes and EXPANDS the final plan. on_step(step) streams raw steps as they arrive;
+        on_restart() means the streamed steps are void (escalated to another model) and streaming starts over.
+        """
         breakdown = toolbox_logger.read_stage_file("1_main_breakdown.json")
         tools = toolbox_logger.read_stage_file("3_available_tools.json")
+        icons = [i["name"] for i in self.db.list_icons()]
         system_context = system_monitor.get_system_context_string()
 
-        prompt = f"""USER GOAL: "{user_goal}"
+        def render(tools, plan, steps):
+            return f"""USER GOAL: "{user_goal}"
 TASK BREAKDOWN: {json.dumps(breakdown)}
-AVAILABLE TOOLS: {json.dumps(tools)}
+AVAILABLE TOOLS: {tools}
+AVAILABLE ICONS: {json.dumps(icons)}
 {system_context}
 
 YOUR TASK:
@@ -94,6 +134,7 @@ Using the available tools and breakdown, create a final execution plan.
 - 💾 FILE SAVING SAFETY: macOS Save dialogs are slow. Always use `wait(2)` before typing a filename and `press_key("enter")` TWICE.
 - 🏗️ LINEARITY: Output a clean, linear list of actions.
 - 🌐 NAVIGATION: Use `navigate(url="...")` for all website navigation.
+- 🖼️ ICONS: For buttons without text (search magnifier, send arrow), use `click_image(name="...")` with a name from AVAILABLE ICONS.
 - 💎 DATA EXTRACTION: Use `extract_info(description="...")`.
 - 💎 DYNAMIC DATA: Use "$LAST_READ" for typed information.
 - Example: 
@@ -106,66 +147,79 @@ Using the available tools and breakdown, create a final execution plan.
 
 Output ONLY a JSON list of actions.
 """
+        prompt = prompt_budget.fit("stage_4", render, tools=tools)
         print("   🧠 [Stage 4] Composing high-level plan...")
-        raw_plan = groq_brain.get_action_plan(prompt, model_id=self.model)
+        raw_plan = _require(self.router.call("stage_4", lambda model: groq_brain.get_action_plan(prompt, model_id=model, stage="stage_4", on_step=on_step),
+                                             on_escalate=on_restart), "Stage 4", "stage_4")
         
+        if EXPANSION_MODE == "lazy":
+            # Keep the plan compact; execution expands call_tool step by step
+            print("   🔧 [Stage 4] Keeping tool calls compact (lazy expansion)...")
+            self.get_expander(tools)
+            plan = raw_plan if isinstance(raw_plan, list) else []
+            return toolbox_logger.save_stage_file("4_final_execution.json", plan)
+
         # --- NEW: EXPANSION LOGIC ---
         print("   🔧 [Stage 4] Expanding tool calls into primitives...")
         expanded_plan = self.expand_plan_recursive(raw_plan, tools)
         
         return toolbox_logger.save_stage_file("4_final_execution.json", expanded_plan)
 
+    def get_expander(self, tools_list=None):
+        """ToolExpander for the current tool list (Stage 3 output by default)."""
+        if tools_list is None:
+            if self.expander is not None:
+                return self.expander
+            tools_list = toolbox_logger.read_stage_file("3_available_tools.json") or []
+        # Reuse compiled templates and cached expansions while the tools' content is unchanged
+        # (Stage 3 output is re-read from disk each run, so identity never matches)
+        key = tool_expander.tools_fingerprint(tools_list)
+        if self.expander is None or self.expander_source != key:
+            self.expander = tool_expander.ToolExpander(tools_list)
+            self.expander_source = key
+        return self.expander
+
+    def iter_plan(self, plan):
+        """Yields (path, primitive_step). Lazy mode expands call_tool only when reached."""
+        if EXPANSION_MODE == "lazy":
+            return self.get_expander().iter_steps(plan)
+        return (((i,), step) for i, step in enumerate(plan or []))
+
     def expand_plan_recursive(self, plan, tools_list):
-        """Recursively flattens call_tool into primitive actions."""
-        if not isinstance(plan, list): return []
-        
-        # Create a lookup map for the tools we have
-        tool_map = {t["name"]: t for t in tools_list}
-        
-        final_plan = []
-        for step in plan:
-            if not isinstance(step, dict): continue
-            
-            action = step.get("action")
-            if action == "call_tool":
-                # Be flexible: check 'name' or 'tool'
-                tool_name = step.get("name") or step.get("tool")
-                params = step.get("params", {})
-                
-                if tool_name in tool_map:
-                    # 1. Get tool body
-                    body = tool_map[tool_name].get("body", [])
-                    # 2. Parameter Substitution
-                    body_str = json.dumps(body)
-                    for k, v in params.items():
-                        body_str = body_str.replace(f"{{{k}}}", str(v))
-                    
-                    expanded_steps = json.loads(body_str)
-                    # 3. Recurse (in case of nested tools)
-                    final_plan.extend(self.expand_plan_recursive(expanded_steps, tools_list))
-                else:
-                    print(f"   ⚠️  Warning: Tool '{tool_name}' not found in available tools list.")
-                    final_plan.append(step) # Keep it as is (will likely fail later)
-            else:
-                final_plan.append(step)
-                
-        return final_plan
+        """Flattens call_tool into primitive actions (see tool_expander.ToolExpander)."""
+        expander = self.get_expander(tools_list)
+        expanded = expander.expand(plan)
+        print(f"   🔧 [Expansion] {expander.report_line()}")
+        return expanded
 
     # --- STAGE 5: SURGICAL FIX ---
-    def stage_5_surgical_fix(self, user_goal, feedback, steps_done):
-        """Generates a corrective plan based on feedback."""
-        full_plan = toolbox_logger.read_stage_file("4_final_execution.json")
-        tools = toolbox_logger.read_stage_file("3_available_tools.json")
+    def stage_5_surgical_fix(self, user_goal, feedback, steps_done, plan=None, failed_index=None, partial=0):
+        """
+        Generates a corrective plan based on feedback.
+        With a known failed_index (and FIX_MODE "suffix") only the remaining suffix is
+        regenerated; returns {"plan": ..., "resume_index": ...} ready to resume execution.
+        `partial` is how many sub-steps of the failed tool call already ran (the last ones in steps_done).
+        Otherwise returns the full corrected plan (list), as before.
+        """
+        if plan is None:
+            plan = toolbox_logger.read_stage_file("4_final_execution.json")
+        if FIX_MODE == "suffix" and plan and failed_index is not None:
+            return self._stage_5_suffix_fix(user_goal, feedback, steps_done, plan, failed_index, partial)
+
+        full_plan = plan
+        tools = self._fix_tools()
         
-        prompt = f"""### 🎯 MAIN GOAL: "{user_goal}"
-### 📋 PREVIOUS PLAN: {json.dumps(full_plan)}
-### 🟢 COMPLETED STEPS: {json.dumps(steps_done)}
+        def render(tools, plan, steps):
+            return f"""### 🎯 MAIN GOAL: "{user_goal}"
+### 📋 PREVIOUS PLAN: {plan}
+### 🟢 COMPLETED STEPS: {steps}
 ### 🔴 ERROR/USER FEEDBACK: "{feedback}"
-### 🧰 AVAILABLE TOOLS: {json.dumps(tools)}
+### 🧰 AVAILABLE TOOLS: {tools}
 
 YOUR TASK:
 Refer to the original plan and the feedback. You MUST fix the error.
 - 🧱 MANDATORY FEEDBACK: You MUST follow the User Feedback word-for-word. If they said "open brave", you CANNOT use "Chrome".
+- 🔁 REPEATS: `"repeat": n` on a listed step means it ran n times in a row; write repeated steps out in full.
 - 🏗️ FULL SEQUENCE: Output the FULL corrected plan from start to finish.
 - 🏢 APP CONSISTENCY: ALWAYS use the same browser/apps mentioned in the feedback or the original successful steps.
 - 🚫 BROWSER SEARCH: NEVER use `command+f` in a browser.
@@ -176,10 +230,59 @@ Refer to the original plan and the feedback. You MUST fix the error.
 - 💎 DYNAMIC DATA: Use "$LAST_READ" for typed data.
 - Output ONLY a JSON list.
 """
+        prompt = prompt_budget.fit("stage_5", render, tools=tools, plan=full_plan, steps=steps_done)
         print("   🧠 [Stage 5] Generating surgical fix...")
-        result = groq_brain.get_action_plan(prompt, model_id=self.model)
+        result = self.router.call("stage_5", lambda model: groq_brain.get_action_plan(prompt, model_id=model, stage="stage_5"))
         return toolbox_logger.save_stage_file("5_surgical_fix.json", result)
 
+    def _fix_tools(self):
+        # Stage files are cleared when execution starts; the expander still holds the tools
+        return toolbox_logger.read_stage_file("3_available_tools.json") or list(self.get_expander().tools.values())
+
+    def _stage_5_suffix_fix(self, user_goal, feedback, steps_done, plan, failed_index, partial=0):
+        expander = self.get_expander()
+        tools = self._fix_tools()
+        remaining = plan[failed_index:]
+        failed_at = json.dumps(remaining[0]) if remaining else "end of plan"
+        if partial:
+            failed_at += (f" (partly run: its first {partial} actions are the last ones under ALREADY DONE; "
+                          f"replace it with only the actions it still needs)")
+
+        def render(tools, plan, steps):
+            return f"""### 🎯 MAIN GOAL: "{user_goal}"
+### 🟢 ALREADY DONE (do NOT repeat): 
+{summarize_steps(steps_done)}
+### 🔴 FAILED AT: {failed_at}
+### 📋 REMAINING PLAN (from the failed step): {plan}
+### 🔴 ERROR/USER FEEDBACK: "{feedback}"
+### 🧰 AVAILABLE TOOLS: {tools}
+
+YOUR TASK:
+The steps under ALREADY DONE have run successfully; the screen is in the state they left it.
+Rewrite ONLY the remaining part of the plan, starting with a replacement for the failed step.
+- 🧱 MANDATORY FEEDBACK: You MUST follow the User Feedback word-for-word. If they said "open brave", you CANNOT use "Chrome".
+- 🔁 REPEATS: `"repeat": n` on a listed step means it ran n times in a row; write repeated steps out in full.
+- ✂️ SUFFIX ONLY: Do NOT repeat completed steps. Output only what still needs to happen.
+- 🏢 APP CONSISTENCY: ALWAYS use the same browser/apps mentioned in the feedback or the original successful steps.
+- 🚫 BROWSER SEARCH: NEVER use `command+f` in a browser.
+- 🎯 CONTEXTUAL CLICKING: NEVER use `click_text` for search results. ALWAYS use `click_near(target="...", anchor="...")`.
+- 🌐 NAVIGATION: Use `navigate(url="...")` for all website navigation.
+- 💎 DATA EXTRACTION: Use `extract_info(description="...")`.
+- 💎 DYNAMIC DATA: Use "$LAST_READ" for typed data.
+- Output ONLY a JSON list.
+"""
+        prompt = prompt_budget.fit("stage_5", render, tools=tools, plan=remaining)
+        print(f"   🧠 [Stage 5] Regenerating steps {failed_index + 1}-{len(plan)} (keeping {failed_index} completed)...")
+        suffix = self.router.call("stage_5", lambda model: groq_brain.get_action_plan(prompt, model_id=model, stage="stage_5"))
+        if not isinstance(suffix, list) or not suffix:
+            return None
+        toolbox_logger.save_stage_file("5_surgical_fix.json", suffix)
+
+        if EXPANSION_MODE != "lazy":
+            suffix = expander.expand(suffix)
+            print(f"   🔧 [Expansion] {expander.report_line()}")
+        return {"plan": plan[:failed_index] + suffix, "resume_index": failed_index}
+
     # --- STAGE 6: GENERALIZATION ---
     def stage_6_generalize(self, user_goal, successful_trace):
         """Cleans up and parameterizes the successful plan for SQL."""
@@ -206,7 +309,7 @@ Output JSON Format:
 }}
 """
         print("   🧠 [Stage 6] Generalizing tool for SQL storage...")
-        result = groq_brain.get_action_plan(prompt, model_id=self.model)
+        result = self.router.call("stage_6", lambda model: groq_brain.get_action_plan(prompt, model_id=model, stage="stage_6"))
         
         if result and isinstance(result, dict) and "name" in result:
             print(f"   ✨ Stage 6 Success: Generalizing as tool '{result['name']}'")
@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog, ttk
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import queue
 import time
 import json
@@ -8,6 +9,11 @@ import os
 import agent_compiler
 import client_app
 import toolbox_logger
+import focus_tracker
+import groq_resilience
+import plan_extractor
+import window_utils
+import system_monitor
 import sys
 import pyautogui
 
@@ -22,6 +28,9 @@ class AgentHUDV3:
         self.root.geometry("650x220+50+50")
         self.root.attributes('-topmost', True)
         self.root.configure(bg="#121212")
+        # Cached HUD exclusion rects must follow the window when it moves/resizes
+        self.last_geometry = None
+        self.root.bind("<Configure>", self.on_configure)
 
         # --- ENGINES ---
         self.compiler = agent_compiler.AgentCompiler()
@@ -32,6 +41,10 @@ class AgentHUDV3:
         self.user_goal = ""
         self.current_plan = []
         self.completed_steps = []
+        self.failed_path = None # (plan index, ...) of the step that failed
+        self.resume_index = 0 # Plan index the next execution starts from
+        self.session_context = {} # Executor context ($LAST_READ etc.), kept across a suffix resume
+        self.block_start = 0 # len(completed_steps) when the current top-level step began
         self.high_level_blocks = []
         self.current_block_idx = 0
         self.execution_state = "IDLE" # IDLE, COMPILING, REVIEW, RUNNING, VERIFYING, FIXING
@@ -81,6 +94,7 @@ class AgentHUDV3:
             if not text: return
             self.user_goal = text
             self.completed_steps = [] # CLEAR HISTORY for new goal
+            self.resume_index = 0
             print(f"\n📝 NEW GOAL: {text}")
             self.input_entry.delete(0, tk.END)
             self.start_compilation()
@@ -112,6 +126,15 @@ class AgentHUDV3:
         self.stop_event.set()
         self.set_status("INTERRUPTING...", "#FF4500")
 
+    def on_configure(self, event):
+        # <Configure> also fires for every child widget; only the HUD window itself matters
+        if event.widget is not self.root:
+            return
+        geometry = (event.x, event.y, event.width, event.height)
+        if geometry != self.last_geometry:
+            self.last_geometry = geometry
+            window_utils.invalidate_exclusion_rects()
+
     def set_status(self, text, color="#00BFFF"):
         self.status_label.config(text=text, fg=color)
 
@@ -131,24 +154,9 @@ class AgentHUDV3:
     def _compilation_thread(self):
         try:
             print("   --- Reasoning Pipeline Started ---")
-            # Stage 1
-            print("   [1/4] Breaking down main task...")
-            self.msg_queue.put(("detail", "Stage 1: Breaking down task..."))
-            self.high_level_blocks = self.compiler.stage_1_main_breakdown(self.user_goal)
-            self.msg_queue.put(("progress", 25))
-
-            # Stage 2 & 3
-            print("   [2/4] Expanding semantic keywords & fetching tools...")
-            self.msg_queue.put(("detail", "Stage 2 & 3: Finding relevant tools..."))
-            self.compiler.stage_2_semantic_search(self.user_goal)
-            self.compiler.stage_3_available_tools()
-            self.msg_queue.put(("progress", 50))
-
-            # Stage 4
-            print("   [3/4] Composing final execution plan...")
-            self.msg_queue.put(("detail", "Stage 4: Composing final execution plan..."))
-            self.current_plan = self.compiler.stage_4_final_execution(self.user_goal)
-            self.msg_queue.put(("progress", 100))
+            # One system snapshot is shared by Stage 1 and Stage 4
+            with system_monitor.compile_scope():
+                self._run_compile_stages()
 
             print("   [4/4] Plan ready for review.")
             print("\n📋 COMPILED PLAN:")
@@ -160,15 +168,57 @@ class AgentHUDV3:
             print(f"   ❌ COMPILATION ERROR: {e}")
             self.msg_queue.put(("error", str(e)))
 
+    def _run_compile_stages(self):
+        # Stage 2 only needs the goal, so its request runs alongside Stage 1's
+        pool = ThreadPoolExecutor(max_workers=1)
+        stage_2 = pool.submit(self.compiler.stage_2_semantic_search, self.user_goal)
+        pool.shutdown(wait=False) # The submitted call still runs; no more work goes to this pool
+
+        # Stage 1
+        print("   [1/4] Breaking down main task...")
+        self.msg_queue.put(("detail", "Stage 1: Breaking down task..."))
+        self.high_level_blocks = self.compiler.stage_1_main_breakdown(self.user_goal)
+        self.msg_queue.put(("progress", 25))
+
+        # Stage 2 & 3
+        print("   [2/4] Expanding semantic keywords & fetching tools...")
+        self.msg_queue.put(("detail", "Stage 2 & 3: Finding relevant tools..."))
+        stage_2.result() # Re-raises Stage 2 errors (Stage 3 must not read a stale keyword file)
+        self.compiler.stage_3_available_tools()
+        self.msg_queue.put(("progress", 50))
+
+        # Stage 4
+        print("   [3/4] Composing final execution plan...")
+        self.msg_queue.put(("detail", "Stage 4: Composing final execution plan..."))
+        streamed = []
+        def on_step(step):
+            # Show the plan as it is being written
+            streamed.append(step)
+            print(f"   📥 Step {len(streamed)}: {json.dumps(step)}")
+            self.msg_queue.put(("detail", f"Stage 4: received step {len(streamed)}\nAction: {step.get('action') if isinstance(step, dict) else step}"))
+            self.msg_queue.put(("progress", min(95, 50 + 3 * len(streamed))))
+        def on_restart():
+            # Escalated to the large model: it streams the plan again from step 1
+            streamed.clear()
+            self.msg_queue.put(("detail", "Stage 4: retrying on the large model..."))
+            self.msg_queue.put(("progress", 50))
+
+        self.current_plan = self.compiler.stage_4_final_execution(self.user_goal, on_step=on_step, on_restart=on_restart)
+        self.msg_queue.put(("progress", 100))
+
     def start_execution(self):
         self.execution_state = "RUNNING"
         self.go_btn.config(state=tk.DISABLED, text="Executing...")
         self.stop_btn.config(state=tk.NORMAL)
         self.current_block_idx = 0
-        self.completed_steps = []
-        toolbox_logger.clear_log()
-        
-        print("\n🚀 STARTING EXECUTION")
+        self.failed_path = None
+        if self.resume_index:
+            print(f"\n♻️ RESUMING EXECUTION AT STEP {self.resume_index + 1} ({self.resume_index} steps already done)")
+        else:
+            self.completed_steps = []
+            self.session_context = {"last_read": ""}
+            toolbox_logger.clear_log()
+            print("\n🚀 STARTING EXECUTION")
         # Ensure focus is away from HUD
         self.switch_focus()
         threading.Thread(target=self._execution_loop).start()
@@ -189,23 +239,37 @@ class AgentHUDV3:
             time.sleep(0.1)
             pyautogui.keyUp('alt')
         time.sleep(0.5) # Wait for animation
+        focus_tracker.get_tracker().invalidate()
+        window_utils.invalidate_exclusion_rects()
 
     def _execution_loop(self):
         """Executes the plan from Stage 4 block by block."""
         try:
             plan = self.current_plan
-            session_context = {"last_read": ""} # Persistent context for the whole run
+            # Persistent context for the whole run (expander serves call_tool inside loops)
+            session_context = self.session_context
+            session_context["expander"] = self.compiler.get_expander()
+            
+            start, self.resume_index = self.resume_index, 0
+            current_index = None
             
-            for i, step in enumerate(plan):
+            # path[0] is the plan index; deeper entries locate a step inside a lazily expanded tool
+            for path, step in self.compiler.iter_plan(plan[start:]):
+                path = (path[0] + start,) + path[1:]
+                label = ".".join(str(p + 1) for p in path)
+                if path[0] != current_index:
+                    current_index = path[0]
+                    self.block_start = len(self.completed_steps)
                 if self.stop_event.is_set():
+                    self.failed_path = path # Resume point for a suffix fix
                     print("\n⚠️ EXECUTION PAUSED FOR FEEDBACK")
                     self.msg_queue.put(("ask_feedback", "Execution stopped by user."))
                     return
 
                 action = step.get("action") or list(step.keys())[0]
-                print(f"👉 Step {i+1}/{len(plan)}: {action} | {step}")
+                print(f"👉 Step {label}/{len(plan)}: {action} | {step}")
                 
-                self.msg_queue.put(("status", (f"RUNNING STEP {i+1}/{len(plan)}", "#00BFFF")))
+                self.msg_queue.put(("status", (f"RUNNING STEP {label}/{len(plan)}", "#00BFFF")))
                 self.msg_queue.put(("detail", f"Action: {action}\nData: {json.dumps(step)}"))
                 
                 # Execute with persistent context
@@ -217,7 +281,8 @@ class AgentHUDV3:
                     self.completed_steps.append(step)
                 else:
                     print(f"   ❌ STEP FAILED: {action}")
-                    self.msg_queue.put(("ask_feedback", f"Step {i+1} failed: {action}"))
+                    self.failed_path = path
+                    self.msg_queue.put(("ask_feedback", f"Step {label} failed: {action}"))
                     return
                 
                 time.sleep(0.5)
@@ -240,22 +305,37 @@ class AgentHUDV3:
             toolbox_logger.log_feedback(feedback)
             # Stage 5
             print("   [1/1] Generating corrective plan based on feedback...")
-            new_remaining_plan = self.compiler.stage_5_surgical_fix(self.user_goal, feedback, self.completed_steps)
-            if new_remaining_plan:
+            failed_index = self.failed_path[0] if self.failed_path else None
+            # Failed inside an expanded call_tool: its sub-steps that already ran stay done
+            # (typing and clicks must not happen twice); the fix replaces only the rest of the call
+            partial = len(self.completed_steps) - self.block_start if self.failed_path and len(self.failed_path) > 1 else 0
+            fix = self.compiler.stage_5_surgical_fix(self.user_goal, feedback, self.completed_steps,
+                                                     plan=self.current_plan, failed_index=failed_index, partial=partial)
+            if isinstance(fix, dict):
+                # Suffix fix: keep the completed steps and resume at the failed step
+                self.current_plan = fix["plan"]
+                self.resume_index = fix["resume_index"]
+                print(f"\n📋 NEW CORRECTIVE PLAN (from step {self.resume_index + 1}):")
+                print(json.dumps(self.current_plan[self.resume_index:], indent=2))
+                print("-" * 20)
+            elif fix:
                 # We overwrite the current plan with the fix
-                self.current_plan = new_remaining_plan 
+                self.current_plan = fix
+                self.resume_index = 0
                 self.completed_steps = [] # RESET HISTORY so the trace stays clean
                 print("\n📋 NEW CORRECTIVE PLAN (Full Sequence):")
                 print(json.dumps(self.current_plan, indent=2))
                 print("-" * 20)
-                # Reset stop event so we can run again
-                self.stop_event.clear()
-                # Ensure focus is back to workspace
-                self.switch_focus()
-                self.msg_queue.put(("state_change", "REVIEW"))
             else:
                 print("   ❌ FIX GENERATION FAILED")
                 self.msg_queue.put(("error", "Failed to generate fix plan."))
+                return
+
+            # Reset stop event so we can run again
+            self.stop_event.clear()
+            # Ensure focus is back to workspace
+            self.switch_focus()
+            self.msg_queue.put(("state_change", "REVIEW"))
         except Exception as e:
             print(f"   ❌ FIX ERROR: {e}")
             self.msg_queue.put(("error", str(e)))
@@ -316,6 +396,8 @@ class AgentHUDV3:
             threading.Thread(target=self.compiler.stage_6_generalize, args=(self.user_goal, self.completed_steps)).start()
         else:
             self.set_status("READY", "#00BFFF")
+        print(f"📊 Groq calls: {groq_resilience.get_caller().summary()}")
+        print(f"📊 Plan extraction: {plan_extractor.summary()}")
 
 if __name__ == "__main__":
 
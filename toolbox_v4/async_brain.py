@@ -0,0 +1,190 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+import httpx
+from groq import AsyncGroq
+import groq_brain
+import groq_resilience
+
+# --- CONFIGURATION ---
+# Requests in flight at once (shared by every stage and background Stage 6)
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "4"))
+# Seconds before a single call is abandoned
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "90"))
+# Hedging: send a duplicate request once the first is slower than the recent p95
+GROQ_HEDGE = os.getenv("GROQ_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 10
+HEDGE_MIN_DELAY = 1.0
+
+
+class AsyncBrain:
+    """
+    asyncio-native Groq access:
+    - one AsyncGroq client over a shared httpx connection pool (keep-alive reuse),
+    - a semaphore capping concurrent requests,
+    - a per-call timeout,
+    - optional hedged requests (duplicate after the model's p95 latency, first answer wins).
+    Sync code calls through run(), which uses a private event loop thread.
+    """
+    def __init__(self, api_key=None, base_url=None, max_concurrency=GROQ_MAX_CONCURRENCY,
+                 timeout=GROQ_TIMEOUT, hedge=GROQ_HEDGE):
+        self.api_key = api_key or groq_brain.API_KEY
+        self.base_url = base_url or groq_brain.BASE_URL
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.hedge = hedge
+        self.latencies = {} # model -> recent latencies (small and large tiers differ a lot)
+        self.stats = {"calls": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0, "errors": 0}
+        self.client = None
+        self.semaphore = None
+        self.loop = None
+        self.loop_lock = threading.Lock()
+
+    # --- Event loop for sync callers ---
+
+    def _ensure_loop(self):
+        with self.loop_lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                t = threading.Thread(target=self.loop.run_forever, name="async-brain")
+                t.daemon = True
+                t.start()
+        return self.loop
+
+    def run(self, coro, timeout=None):
+        """Runs a coroutine on the brain's loop from any (non-async) thread and waits for it."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return future.result(timeout)
+
+    def _client(self):
+        # Created on first use inside the loop that will drive it
+        if self.client is None:
+            http = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_concurrency * 2,
+                                    max_keepalive_connections=self.max_concurrency * 2),
+                timeout=self.timeout
+            )
+            # Retries are handled by groq_resilience (classified, rate-limit aware)
+            kwargs = {"api_key": self.api_key, "http_client": http, "max_retries": 0}
+            if self.base_url:
+                kwargs["base_url"] = self.base_url
+            self.client = AsyncGroq(**kwargs)
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.client
+
+    # --- Requests ---
+
+    def hedge_delay(self, model):
+        """Recent p95 latency of this model, or None until there are enough samples."""
+        samples = self.latencies.get(model, ())
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return max(HEDGE_MIN_DELAY, ordered[int(HEDGE_PERCENTILE * (len(ordered) - 1))])
+
+    async def _once(self, params):
+        start = time.perf_counter()
+        completion = await self._client().chat.completions.create(**params)
+        self.latencies.setdefault(params["model"], deque(maxlen=200)).append(time.perf_counter() - start)
+        return completion.choices[0].message.content
+
+    async def _hedged(self, params, hedge):
+        delay = self.hedge_delay(params["model"]) if hedge else None
+        pending = set()
+        try:
+            # Created inside the try so a cancellation at any point cancels every request in flight
+            primary = asyncio.ensure_future(self._once(params))
+            pending = {primary}
+            if delay is None:
+                return await primary
+
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            self.stats["hedges"] += 1
+            backup = asyncio.ensure_future(self._once(params))
+            pending = {primary, backup}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+                # A request that failed just as we gave up: mark its error as seen
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def complete(self, messages, model_id=None, timeout=None, hedge=None, **extra):
+        """Returns the completion text. Each attempt times out after `timeout` seconds; retries per groq_resilience."""
+        params = {
+            "model": model_id or groq_brain.MODEL_ID,
+            "messages": messages,
+            "temperature": 0.0,
+            "stream": False,
+        }
+        params.update(extra)
+        self._client()
+        self.stats["calls"] += 1
+
+        async def attempt():
+            # The slot is held per attempt, not across retry backoff
+            async with self.semaphore:
+                return await asyncio.wait_for(self._hedged(params, self.hedge if hedge is None else hedge),
+                                              timeout or self.timeout)
+        try:
+            return await groq_resilience.get_caller().call_async(attempt)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+
+    async def get_raw_text(self, prompt, model_id=None, timeout=None):
+        """Async twin of groq_brain.get_raw_text."""
+        try:
+            text = await self.complete([{"role": "user", "content": prompt}], model_id, timeout)
+            return text.strip()
+        except Exception as e:
+            print(f"❌ Groq Raw API Error: {e!r}")
+            return "Error"
+
+    async def get_action_plan(self, user_prompt, model_id=None, timeout=None, stage=None):
+        """Async twin of groq_brain.get_action_plan."""
+        params = groq_brain.plan_request(user_prompt, model_id)
+        try:
+            text = await self.complete(params.pop("messages"), params.pop("model"), timeout, **params)
+            if groq_brain.DEBUG_RESPONSES:
+                print(f"🔍 DEBUG RAW RESPONSE:\n{text}\n" + "-"*20)
+            return groq_brain.parse_plan(text, stage)
+        except Exception as e:
+            print(f"❌ Groq API Error: {e!r}")
+            return None
+
+    def summary(self):
+        s = self.stats
+        line = f"calls {s['calls']} | hedges {s['hedges']} (won {s['hedge_wins']}) | timeouts {s['timeouts']} | errors {s['errors']}"
+        p95 = [f"{model} {self.hedge_delay(model):.2f}s" for model in self.latencies if self.hedge_delay(model)]
+        return line + (f" | p95: {', '.join(p95)}" if p95 else "")
+
+
+_brain = None
+_brain_lock = threading.Lock()
+
+def get_brain():
+    """Process-wide brain so every caller shares one pool and one concurrency limit."""
+    global _brain
+    with _brain_lock:
+        if _brain is None:
+            _brain = AsyncBrain()
+        return _brain
@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import mock_groq_server
+
+# Usage: python bench_pipeline.py [goals] [latency_scale]
+# Runs the compiler against the offline Groq stand-in: no network, no API key, deterministic timings.
+# Everything the pipeline writes (stage files, logs, stats, local toolbox) goes to a throwaway directory.
+
+GOALS = [
+    "search Nvidia stock price on google and save the price in notes",
+    "check the Apple stock price and write it down in notes",
+    "find the Tesla stock price in the browser and save it to notes",
+    "look up the Microsoft share price and keep it in notes",
+]
+BENCH_TOOLS = [
+    ("open_browser", "Opens a web browser", ["browser"],
+     [{"action": "open_app", "name": "{browser}"}, {"action": "wait", "seconds": 5}]),
+]
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    goals_count = int(sys.argv[1]) if len(sys.argv) > 1 else len(GOALS)
+    scale = float(sys.argv[2]) if len(sys.argv) > 2 else mock_groq_server.MOCK_GROQ_LATENCY_SCALE
+    goals = [GOALS[i % len(GOALS)] for i in range(goals_count)]
+
+    server, book, url = mock_groq_server.start_server(0, latency_scale=scale)
+    os.environ["GROQ_BASE_URL"] = url
+    os.environ.setdefault("GROQ_API_KEY", "offline")
+    os.environ["SUPABASE_URL"] = "" # Local toolbox only
+    # The stand-in has no quota: don't let the shared request budget dominate the timings
+    os.environ.setdefault("GROQ_RPM", "100000")
+    os.environ.setdefault("GROQ_BURST", "100")
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.chdir(workdir)
+
+    # Imported after the environment is set: these read it at import time
+    import groq_brain
+    import async_brain
+    import groq_resilience
+    import plan_extractor
+    import agent_compiler
+
+    print(f"🧪 Mock Groq at {url} | latency x{scale} | workdir {workdir}")
+    compiler = agent_compiler.AgentCompiler()
+    for name, description, parameters, body in BENCH_TOOLS:
+        compiler.db.save_tool(name, description, parameters, body)
+    results = []
+
+    # 1. Serial pipeline: Stage 1 -> 2 -> 3 -> 4 per goal
+    book.reset_stats()
+    start = time.perf_counter()
+    for goal in goals:
+        compiler.stage_1_main_breakdown(goal)
+        compiler.stage_2_semantic_search(goal)
+        compiler.stage_3_available_tools()
+        compiler.stage_4_final_execution(goal)
+    serial = time.perf_counter() - start
+    results.append(f"Serial pipeline:      {serial:.2f}s for {len(goals)} goals ({len(goals) / serial * 60:.1f} goals/min)")
+
+    # 2. Stage 1 and Stage 2 overlapped (as the GUI runs them)
+    book.reset_stats()
+    start = time.perf_counter()
+    for goal in goals:
+        t = threading.Thread(target=compiler.stage_2_semantic_search, args=(goal,))
+        t.start()
+        compiler.stage_1_main_breakdown(goal)
+        t.join()
+        compiler.stage_3_available_tools()
+        compiler.stage_4_final_execution(goal)
+    overlapped = time.perf_counter() - start
+    results.append(f"Stage 1‖2 overlapped: {overlapped:.2f}s ({serial / overlapped:.2f}x vs serial)")
+
+    # 3. Burst of concurrent requests (concurrency limit of the shared client)
+    book.reset_stats()
+    threads = [threading.Thread(target=groq_brain.get_action_plan, args=(goal,), kwargs={"stage": "stage_4"})
+               for goal in goals * 2]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    burst = time.perf_counter() - start
+    limit = f"limit {async_brain.GROQ_MAX_CONCURRENCY}" if groq_brain.USE_ASYNC_CLIENT else "sync client, no limit"
+    results.append(f"Concurrent burst:     {len(threads)} requests in {burst:.2f}s | peak in-flight {book.peak_inflight} ({limit})")
+
+    # 4. Streaming Stage 4: time to first step vs full plan
+    first = []
+    start = time.perf_counter()
+    on_step = lambda step: first or first.append(time.perf_counter() - start)
+    _, total = timed(compiler.stage_4_final_execution, goals[0], on_step=on_step)
+    if first:
+        results.append(f"Streamed Stage 4:     first step {first[0]:.2f}s | full plan {total:.2f}s")
+
+    # 5. Caching: tool expansion reuse and output recovery
+    expander = compiler.get_expander()
+    results.append(f"Tool expansion:       {expander.report_line()}")
+    results.append(f"Plan extraction:      {plan_extractor.summary()}")
+    results.append(f"Groq calls:           {groq_resilience.get_caller().summary()}")
+    results.append(f"Mock server (3, 4):   {book.summary()}")
+
+    print("\n📊 PIPELINE BENCHMARK")
+    for line in results:
+        print(f"   {line}")
+
+    server.shutdown()
+    agent_compiler.model_router.get_router().flush() # Before its file's directory goes away
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
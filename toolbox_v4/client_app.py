@@ -7,6 +7,7 @@ import pytesseract
 from PIL import Image
 import groq_brain
 import spatial_vision # NEW
+import focus_tracker
 
 # Safety
 pyautogui.FAILSAFE = True
@@ -20,13 +21,12 @@ def power_launch(app_name):
     print(f"   🚀 [POWER] Attempting to launch/focus: {app_name}")
     
     # 1. Check if already focused
+    tracker = focus_tracker.get_tracker()
     if sys.platform == "darwin":
-        try:
-            frontmost = subprocess.check_output(["osascript", "-e", 'tell application "System Events" to get name of first process whose frontmost is true']).decode().strip()
-            if app_name.lower() in frontmost.lower():
-                print(f"   ✨ '{app_name}' is already frontmost. Skipping launch.")
-                return True
-        except: pass
+        frontmost = tracker.frontmost_app()
+        if app_name.lower() in frontmost.lower():
+            print(f"   ✨ '{app_name}' is already frontmost. Skipping launch.")
+            return True
 
     # 2. Spotlight Launch
     print(f"   ⌨️  Using Spotlight for {app_name}...")
@@ -43,6 +43,7 @@ def power_launch(app_name):
     
     # Wait for app to appear
     time.sleep(3.0)
+    tracker.invalidate()
     return True
 
 def power_navigate(url):
@@ -75,15 +76,15 @@ def execute_step(action, params, context=None):
     # 0. Focus Protection: If we are about to type/press, ensure HUD isn't stealing focus
     if action in ["type_text", "press_key"]:
         if sys.platform == "darwin":
-            try:
-                frontmost = subprocess.check_output(["osascript", "-e", 'tell application "System Events" to get name of first process whose frontmost is true']).decode().strip()
-                if "python" in frontmost.lower() or "hud" in frontmost.lower():
-                    # HUD is focused! Switch back.
-                    pyautogui.keyDown('command')
-                    pyautogui.press('tab')
-                    pyautogui.keyUp('command')
-                    time.sleep(0.5)
-            except: pass
+            tracker = focus_tracker.get_tracker()
+            frontmost = tracker.frontmost_app()
+            if "python" in frontmost.lower() or "hud" in frontmost.lower():
+                # HUD is focused! Switch back.
+                pyautogui.keyDown('command')
+                pyautogui.press('tab')
+                pyautogui.keyUp('command')
+                time.sleep(0.5)
+                tracker.invalidate()
 
     # 1. Variable Resolution
     if action == "type_text" and context and "last_read" in context:
@@ -101,6 +102,7 @@ def execute_step(action, params, context=None):
         elif action == "navigate": params = {"url": params}
         elif action == "type_text": params = {"text": params}
         elif action == "click_text": params = {"text": params}
+        elif action == "click_image": params = {"name": params}
         elif action == "press_key": params = {"key": params}
         elif action == "wait": params = {"seconds": params}
         else: params = {}
@@ -123,24 +125,19 @@ def execute_step(action, params, context=None):
         elif action == "click_text":
             text = params.get("text")
             print(f"   🖱️  Clicking: {text}")
-            # Try accessibility first if available
-            try:
-                import screen_search
-                scanner = screen_search.ScreenScanner()
-                if scanner.find_and_click(text):
-                    return True
-            except: pass
-            
-            # Try OCR fallback
-            try:
-                import visual_search
-                if visual_search.visual_find_and_click(text):
-                    return True
-            except: pass
+            # Race accessibility and OCR; the per-app winner is tried first next time
+            import target_resolver
+            if target_resolver.get_resolver().click_text(text):
+                return True
             
             print(f"   ❌ Failed to find text: {text}")
             return False
 
+        elif action == "click_image":
+            import image_search
+            name = params.get("name") or params.get("icon")
+            return image_search.click_image(name, roi=params.get("roi"))
+
         elif action == "click_near":
             target = params.get("target")
             anchor = params.get("anchor")
@@ -164,6 +161,9 @@ def execute_step(action, params, context=None):
                 for m in reversed(mods[:-1]):
                     if m == "cmd": m = "command"
                     pyautogui.keyUp(m)
+                # App switchers move focus
+                if mods[-1] == "tab":
+                    focus_tracker.get_tracker().invalidate()
             else:
                 pyautogui.press(key)
             return True
@@ -217,7 +217,9 @@ def execute_step(action, params, context=None):
             TASK: Extract {description} from the text above. 
             RULES: Output ONLY the numeric value or specific string. No labels.
             """
-            val_str = groq_brain.get_raw_text(filter_prompt, model_id="openai/gpt-oss-120b")
+            import model_router
+            val_str = model_router.get_router().call(
+                "extract_info", lambda model: groq_brain.get_raw_text(filter_prompt, model_id=model))
             
             print(f"   ✨ AI Extracted Value: {val_str}")
             if context is not None:
@@ -239,6 +241,20 @@ def execute_step(action, params, context=None):
                 print("   ⏩ Condition Not Met. Skipping.")
             return True
 
+        elif action == "call_tool":
+            # Lazy expansion: run the tool body one primitive at a time
+            expander = context.get("expander") if context else None
+            if expander is None:
+                print("   ⚠️  call_tool needs an expander in context.")
+                return False
+            for _, sub_step in expander.iter_steps([params]):
+                sub_action = sub_step.get("action")
+                if sub_action == "call_tool": # Could not be expanded
+                    return False
+                if not execute_step(sub_action, sub_step, context):
+                    return False
+            return True
+
         elif action == "loop":
             count = int(params.get("count", 1))
             actions = params.get("actions", [])
@@ -0,0 +1,266 @@
+import os
+import time
+import queue
+import asyncio
+import threading
+
+# --- CONFIGURATION ---
+# "auto" (realtime with polling fallback), "realtime" or "poll"
+COMMAND_FEED_MODE = os.getenv("COMMAND_FEED_MODE", "auto")
+# Adaptive polling: fast right after activity, backing off while idle
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "0.5"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "15"))
+POLL_BACKOFF = 2.0
+# Polls re-read this many ids behind the newest one seen: a row whose transaction
+# commits after a higher id was delivered still gets picked up
+POLL_ID_OVERLAP = int(os.getenv("POLL_ID_OVERLAP", "100"))
+# While realtime is up, a slow safety poll catches anything the socket missed
+SAFETY_POLL_INTERVAL = float(os.getenv("SAFETY_POLL_INTERVAL", "60"))
+REALTIME_CONNECT_TIMEOUT = 10.0
+# How often the realtime watcher wakes to check for stop() (a dropped socket wakes it at once)
+REALTIME_CHECK_INTERVAL = 1.0
+# After falling back to polling, how long until realtime is tried again (seconds)
+REALTIME_RETRY_AFTER = float(os.getenv("REALTIME_RETRY_AFTER", "300"))
+
+
+class RealtimeSubscription:
+    """
+    Supabase Realtime (postgres_changes INSERT on agent_commands, filtered by user).
+    Runs the async client on its own event loop thread and hands rows to on_row.
+    """
+    def __init__(self, url, key, user_email, on_row, table="agent_commands"):
+        self.url = url
+        self.key = key
+        self.user_email = user_email
+        self.on_row = on_row
+        self.table = table
+        self.subscribed = threading.Event()
+        self.down = threading.Event()
+        self.error = None
+        self.loop = None
+
+    def start(self, timeout=None):
+        """Returns True once the channel reports SUBSCRIBED (False at once if it fails first)."""
+        timeout = timeout or REALTIME_CONNECT_TIMEOUT
+        t = threading.Thread(target=self._thread, name="realtime")
+        t.daemon = True
+        t.start()
+        deadline = time.time() + timeout
+        while not self.subscribed.wait(0.1) and not self.down.is_set() and time.time() < deadline:
+            pass
+        if not self.subscribed.is_set():
+            self.error = self.error or "subscribe timed out"
+            self.stop()
+            return False
+        return True
+
+    def alive(self):
+        return self.subscribed.is_set() and not self.down.is_set()
+
+    def stop(self):
+        self.down.set()
+        if self.loop:
+            self.loop.call_soon_threadsafe(lambda: None)
+
+    def _thread(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self._serve())
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.down.set()
+            self.loop.close()
+
+    async def _serve(self):
+        from supabase import acreate_client
+        client = await acreate_client(self.url, self.key)
+        channel = client.channel(f"agent-commands-{self.user_email}")
+        channel.on_postgres_changes(
+            "INSERT", self._on_change,
+            table=self.table, schema="public", filter=f"user_email=eq.{self.user_email}"
+        )
+        await channel.subscribe(self._on_status)
+        try:
+            while not self.down.is_set():
+                await asyncio.sleep(0.5)
+        finally:
+            try:
+                await client.realtime.close()
+            except Exception:
+                pass
+
+    def _on_status(self, status, err=None):
+        status = str(getattr(status, "value", status))
+        if status == "SUBSCRIBED":
+            self.subscribed.set()
+        elif status in ("CLOSED", "CHANNEL_ERROR", "TIMED_OUT"):
+            self.error = f"{status}: {err}" if err else status
+            self.down.set()
+
+    def _on_change(self, payload):
+        # Payload shape differs across realtime-py versions
+        data = payload.get("data") or {}
+        row = data.get("record") or payload.get("new") or payload.get("record")
+        if row:
+            self.on_row(row)
+
+
+class CommandFeed:
+    """
+    Delivers new agent_commands rows for one user, oldest first, once each
+    (rows that commit out of id order included).
+    Prefers Realtime push; falls back to adaptive polling (and retries Realtime later).
+    The handler runs on its own thread, so a slow command never blocks the realtime loop or a poll.
+    """
+    def __init__(self, client, user_email, url=None, key=None, mode=COMMAND_FEED_MODE, table="agent_commands"):
+        self.client = client
+        self.user_email = user_email
+        self.url = url
+        self.key = key
+        self.mode = mode
+        self.table = table
+        self.last_id = 0 # Newest id delivered
+        self.floor = 0 # Commands at or below this id predate us
+        self.delivered = set() # Ids delivered within the poll window
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.inbox = queue.Queue()
+        self.stats = {"pushed": 0, "polled": 0, "late": 0, "polls": 0, "fallbacks": 0, "handler_errors": 0}
+
+        t = threading.Thread(target=self._handle_loop, name="command-handler")
+        t.daemon = True
+        t.start()
+
+    # --- Shared helpers ---
+
+    def fetch_latest_id(self):
+        """Skips commands issued before we came online."""
+        latest = self.client.table(self.table).select("id").eq("user_email", self.user_email)\
+            .order("id", desc=True).limit(1).execute()
+        if latest.data:
+            self.last_id = self.floor = latest.data[0]["id"]
+        return self.last_id
+
+    def _deliver(self, rows, handle, source):
+        """Queues rows for the handler in id order, skipping anything already seen."""
+        for row in sorted(rows, key=lambda r: r["id"]):
+            with self.lock:
+                if row["id"] <= self.floor or row["id"] in self.delivered:
+                    continue
+                if row["id"] < self.last_id:
+                    self.stats["late"] += 1
+                self.delivered.add(row["id"])
+                self.last_id = max(self.last_id, row["id"])
+                if len(self.delivered) > 2 * POLL_ID_OVERLAP:
+                    # Ids below the poll window are never read again
+                    self.delivered = {i for i in self.delivered if i > self.last_id - POLL_ID_OVERLAP}
+            self.stats[source] += 1
+            self.inbox.put((handle, row))
+
+    def _handle_loop(self):
+        while True:
+            item = self.inbox.get()
+            if item is None:
+                return
+            handle, row = item
+            try:
+                handle(row)
+            except Exception as e:
+                self.stats["handler_errors"] += 1
+                print(f"⚠️ Command handler error: {e}")
+            finally:
+                self.inbox.task_done()
+
+    def wait_handled(self, timeout=None):
+        """Blocks until every queued command has been handled (or timeout). Returns True if idle."""
+        deadline = None if timeout is None else time.time() + timeout
+        while self.inbox.unfinished_tasks:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.02)
+        return True
+
+    def poll_once(self, handle):
+        """One query for rows in the poll window (ids past last_id - POLL_ID_OVERLAP). Returns how many were new."""
+        self.stats["polls"] += 1
+        response = self.client.table(self.table)\
+            .select("*")\
+            .eq("user_email", self.user_email)\
+            .gt("id", max(self.floor, self.last_id - POLL_ID_OVERLAP))\
+            .order("id", desc=False)\
+            .execute()
+        before = self.stats["polled"]
+        self._deliver(response.data, handle, "polled")
+        return self.stats["polled"] - before
+
+    # --- Modes ---
+
+    def run(self, handle):
+        """Blocks, calling handle(row) for every new command until stop()."""
+        while not self.stop_event.is_set():
+            if self.mode != "poll" and self.url and self.key:
+                if self._run_realtime(handle):
+                    continue # Realtime dropped after working: try it again right away
+                self.stats["fallbacks"] += 1
+                if self.mode == "realtime":
+                    self.stop_event.wait(POLL_MIN_INTERVAL)
+                    continue
+                print(f"   ↩️  Falling back to adaptive polling for {REALTIME_RETRY_AFTER:.0f}s")
+                self._run_polling(handle, until=time.time() + REALTIME_RETRY_AFTER)
+            else:
+                self._run_polling(handle)
+
+    def _run_realtime(self, handle):
+        """Returns True if the subscription came up (and later dropped), False if it never did."""
+        sub = RealtimeSubscription(self.url, self.key, self.user_email,
+                                   lambda row: self._deliver([row], handle, "pushed"), self.table)
+        if not sub.start():
+            print(f"   ⚠️  Realtime unavailable ({sub.error}).")
+            return False
+
+        print("   ⚡ Realtime subscription active (push delivery).")
+        # Catch anything inserted between fetch_latest_id() and SUBSCRIBED
+        self._safe_poll(handle)
+        next_safety_poll = time.time() + SAFETY_POLL_INTERVAL
+        while not self.stop_event.is_set():
+            # Wakes as soon as the subscription reports CLOSED / CHANNEL_ERROR / TIMED_OUT
+            if sub.down.wait(REALTIME_CHECK_INTERVAL):
+                break
+            if time.time() >= next_safety_poll:
+                self._safe_poll(handle)
+                next_safety_poll = time.time() + SAFETY_POLL_INTERVAL
+        sub.stop()
+        if not self.stop_event.is_set():
+            print(f"   ⚠️  Realtime dropped ({sub.error}).")
+            # Catch up right away; reconnecting can take up to REALTIME_CONNECT_TIMEOUT
+            self._safe_poll(handle)
+        return True
+
+    def _run_polling(self, handle, until=None):
+        interval = POLL_MIN_INTERVAL
+        while not self.stop_event.is_set() and (until is None or time.time() < until):
+            got = self._safe_poll(handle)
+            if got is None:
+                interval = max(interval, 2.0) # Polling Error
+            elif got:
+                interval = POLL_MIN_INTERVAL
+            else:
+                interval = min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
+            self.stop_event.wait(interval)
+
+    def _safe_poll(self, handle):
+        try:
+            return self.poll_once(handle)
+        except Exception as e:
+            print(f"⚠️ Polling Error: {e}")
+            return None
+
+    def stop(self):
+        self.stop_event.set()
+        self.inbox.put(None) # Commands already queued are still handled
+
+    def summary(self):
+        s = self.stats
+        return (f"pushed {s['pushed']} | polled {s['polled']} | late {s['late']} | polls {s['polls']} | "
+                f"fallbacks {s['fallbacks']} | handler errors {s['handler_errors']}")
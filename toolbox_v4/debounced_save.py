@@ -0,0 +1,48 @@
+import os
+import json
+import atexit
+import threading
+
+# --- CONFIGURATION ---
+# A JSON file is rewritten at most once per SAVE_DELAY seconds (and at exit)
+SAVE_DELAY = float(os.getenv("LOCATION_SAVE_DELAY", "2.0"))
+
+
+class DebouncedSave:
+    """
+    Batches rewrites of a JSON file off the hot path.
+    `snapshot()` returns the data to write and is called with the owner's `lock` held;
+    `schedule()` must be called with that lock held too.
+    Writes go to a temp file that replaces the target, one flush at a time, so a
+    slower flush can never leave an older snapshot on disk.
+    """
+    def __init__(self, path, snapshot, lock, delay=SAVE_DELAY):
+        self.path = os.path.abspath(path) if path else path # A later chdir must not move the file
+        self.snapshot = snapshot
+        self.lock = lock
+        self.delay = delay
+        self.write_lock = threading.Lock()
+        self.timer = None
+        self.dirty = False
+        atexit.register(self.flush)
+
+    def schedule(self):
+        """Marks the data changed and starts the timer if none is pending (call with lock held)."""
+        if not self.path: return
+        self.dirty = True
+        if self.timer is None:
+            self.timer = threading.Timer(self.delay, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """Writes pending changes now (debounce timer, exit)."""
+        with self.write_lock:
+            with self.lock:
+                self.timer = None
+                if not self.dirty or not self.path: return
+                data = json.dumps(self.snapshot(), indent=2)
+                self.dirty = False
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'w') as f: f.write(data)
+            os.replace(tmp, self.path)
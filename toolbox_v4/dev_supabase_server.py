@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# --- CONFIGURATION ---
+DEV_SERVER_PORT = int(os.getenv("DEV_SUPABASE_PORT", "54329"))
+
+
+class MemoryTables:
+    """In-memory rows per table with auto-increment ids."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tables = {}
+        self.next_id = {}
+        self.requests = 0
+
+    def insert(self, table, rows):
+        with self.lock:
+            stored = []
+            for row in rows:
+                row = dict(row)
+                if "id" not in row:
+                    self.next_id[table] = self.next_id.get(table, 0) + 1
+                    row["id"] = self.next_id[table]
+                self.tables.setdefault(table, []).append(row)
+                stored.append(row)
+            return stored
+
+    def select(self, table, query):
+        """Supports col=eq.x, col=gt.x, order=col.asc|desc, limit=n, select=a,b."""
+        with self.lock:
+            rows = list(self.tables.get(table, []))
+        for col, values in query.items():
+            if col in ("select", "order", "limit", "offset"):
+                continue
+            op, _, value = values[0].partition(".")
+            if op == "eq":
+                rows = [r for r in rows if str(r.get(col)) == value]
+            elif op == "gt":
+                rows = [r for r in rows if r.get(col) is not None and float(r[col]) > float(value)]
+        if "order" in query:
+            col, _, direction = query["order"][0].partition(".")
+            rows.sort(key=lambda r: r.get(col) or 0, reverse=direction.startswith("desc"))
+        if "limit" in query:
+            rows = rows[:int(query["limit"][0])]
+        if "select" in query and query["select"][0] != "*":
+            cols = query["select"][0].split(",")
+            rows = [{c: r.get(c) for c in cols} for r in rows]
+        return rows
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Tiny PostgREST stand-in: GET/POST /rest/v1/<table>. Realtime is not served."""
+    store = None
+
+    def _table(self):
+        parts = urlparse(self.path).path.strip("/").split("/")
+        if len(parts) == 3 and parts[:2] == ["rest", "v1"]:
+            return parts[2]
+        return None
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.store.requests += 1
+        table = self._table()
+        if not table:
+            return self._reply(404, {"message": "not found"})
+        self._reply(200, self.store.select(table, parse_qs(urlparse(self.path).query)))
+
+    def do_POST(self):
+        self.store.requests += 1
+        table = self._table()
+        if not table:
+            return self._reply(404, {"message": "not found"})
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"[]")
+        rows = self.store.insert(table, body if isinstance(body, list) else [body])
+        self._reply(201, rows)
+
+    def log_message(self, format, *args):
+        pass # Keep the console clean
+
+
+def start_server(port=DEV_SERVER_PORT):
+    """Starts the stand-in on a background thread. Returns (server, store, url)."""
+    store = MemoryTables()
+    handler = type("BoundHandler", (Handler,), {"store": store})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    t = threading.Thread(target=server.serve_forever, name="dev-supabase")
+    t.daemon = True
+    t.start()
+    return server, store, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    # Usage: python dev_supabase_server.py [port]
+    # Then run remote_listener.py with SUPABASE_URL=http://127.0.0.1:<port> SUPABASE_KEY=local.dev.key
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEV_SERVER_PORT
+    server, store, url = start_server(port)
+    print(f"🧪 Dev Supabase (REST only) at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print(f"\n🛑 Stopped. {store.requests} requests served.")
+        server.shutdown()
@@ -0,0 +1,236 @@
+import os
+import sys
+import time
+import threading
+import subprocess
+
+# --- CONFIGURATION ---
+# How long a frontmost-app answer stays valid before we probe again (seconds)
+FOCUS_TTL = float(os.getenv("FOCUS_TTL", "1.0"))
+# How often the long-lived helper re-checks focus (seconds)
+FOCUS_POLL_INTERVAL = float(os.getenv("FOCUS_POLL_INTERVAL", "0.2"))
+# "helper" (default on macOS), "osascript" (one process per probe) or "fake"
+FOCUS_BACKEND = os.getenv("FOCUS_BACKEND", "")
+
+UNKNOWN = ("Unknown", "Unknown")
+
+# --- BACKENDS ---
+
+class OsascriptFocusBackend:
+    """
+    One-shot probe: a single osascript launch returns app AND title together.
+    Used when the helper process is unavailable.
+    """
+    SCRIPT = '''
+tell application "System Events"
+    set frontProc to first process whose frontmost is true
+    set appName to name of frontProc
+    set winTitle to ""
+    try
+        set winTitle to name of first window of frontProc
+    end try
+end tell
+return appName & "\t" & winTitle
+'''
+
+    def read(self):
+        out = subprocess.check_output(["osascript", "-e", self.SCRIPT]).decode().strip("\n")
+        app, _, title = out.partition("\t")
+        return (app.strip() or "Unknown", title.strip() or "Unknown")
+
+    def close(self):
+        pass
+
+
+class HelperFocusBackend:
+    """
+    Long-lived JXA helper. One osascript process polls System Events in a loop
+    and prints a line only when focus changes; a reader thread keeps the latest value.
+    Falls back to a one-shot probe if the helper dies.
+    """
+    SCRIPT = '''
+const se = Application("System Events");
+let last = null;
+while (true) {
+    let app = "", title = "";
+    try {
+        const p = se.processes.whose({frontmost: true})[0];
+        app = p.name();
+        try { title = p.windows[0].name(); } catch (e) {}
+    } catch (e) {}
+    const line = app + "\\t" + title;
+    if (line !== last) { console.log(line); last = line; }
+    delay(%s);
+}
+'''
+
+    def __init__(self, interval=FOCUS_POLL_INTERVAL):
+        self.interval = interval
+        self.latest = None
+        self.fallback = OsascriptFocusBackend()
+        self.ready = threading.Event()
+        # JXA console.log writes to stderr
+        self.proc = subprocess.Popen(
+            ["osascript", "-l", "JavaScript", "-e", self.SCRIPT % self.interval],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+        t = threading.Thread(target=self._reader)
+        t.daemon = True
+        t.start()
+
+    def _reader(self):
+        for line in iter(self.proc.stderr.readline, b''):
+            app, _, title = line.decode('utf-8', errors='replace').rstrip("\n").partition("\t")
+            self.latest = (app.strip() or "Unknown", title.strip() or "Unknown")
+            self.ready.set()
+        self.ready.set()
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def read(self):
+        # First answer can take a moment while the helper boots
+        self.ready.wait(timeout=1.0)
+        if self.alive() and self.latest:
+            return self.latest
+        return self.fallback.read()
+
+    def close(self):
+        if self.alive():
+            self.proc.terminate()
+
+
+class WindowsFocusBackend:
+    """pygetwindow-based probe (in-process, no subprocess)."""
+    def read(self):
+        import pygetwindow as gw
+        window = gw.getActiveWindow()
+        if not window:
+            return UNKNOWN
+        # On Windows, process name is harder, but title often contains app name
+        return (window.title.split(" - ")[-1], window.title)
+
+    def close(self):
+        pass
+
+
+class FakeFocusBackend:
+    """Scriptable backend for Linux/CI. Call set() to simulate a focus change."""
+    def __init__(self, app="Unknown", title="Unknown"):
+        self.app = app
+        self.title = title
+        self.reads = 0
+
+    def set(self, app, title="Unknown"):
+        self.app = app
+        self.title = title
+
+    def read(self):
+        self.reads += 1
+        return (self.app, self.title)
+
+    def close(self):
+        pass
+
+
+def _default_backend():
+    choice = FOCUS_BACKEND.lower()
+    if choice == "fake":
+        return FakeFocusBackend()
+    if sys.platform == "darwin":
+        if choice == "osascript":
+            return OsascriptFocusBackend()
+        try:
+            return HelperFocusBackend()
+        except Exception as e:
+            print(f"⚠️ Focus helper failed to start ({e}). Using one-shot osascript.")
+            return OsascriptFocusBackend()
+    if sys.platform == "win32":
+        return WindowsFocusBackend()
+    return FakeFocusBackend()
+
+# --- TRACKER ---
+
+class FocusTracker:
+    """
+    Single query API for "which app/window is in front?".
+    Answers are cached for `ttl` seconds; `generation` bumps whenever focus changes
+    so other caches (AX snapshots, exclusion rects) know when to invalidate.
+    """
+    def __init__(self, backend=None, ttl=FOCUS_TTL):
+        self.backend = backend or _default_backend()
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.value = UNKNOWN
+        self.fetched_at = 0.0
+        self.generation = 0
+        self.probes = 0
+
+    def get(self, max_age=None):
+        """Returns {"app": ..., "title": ...} for the frontmost window."""
+        max_age = self.ttl if max_age is None else max_age
+        with self.lock:
+            if time.time() - self.fetched_at > max_age:
+                self.probes += 1
+                try:
+                    value = self.backend.read()
+                except Exception:
+                    value = UNKNOWN # Fallback to Unknown
+                self._store(value)
+            app, title = self.value
+        return {"app": app, "title": title}
+
+    def _store(self, value):
+        if value != self.value:
+            self.generation += 1
+        self.value = value
+        self.fetched_at = time.time()
+
+    def prime(self, app, title):
+        """Seeds the cache with a value probed elsewhere (e.g. a system snapshot)."""
+        with self.lock:
+            self._store((app or "Unknown", title or "Unknown"))
+
+    def frontmost_app(self):
+        return self.get()["app"]
+
+    def invalidate(self):
+        """Forces the next query to probe (call after anything that moves focus)."""
+        with self.lock:
+            self.fetched_at = 0.0
+
+    def close(self):
+        self.backend.close()
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def get_tracker():
+    """Process-wide tracker shared by all call sites."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = FocusTracker()
+        return _tracker
+
+def set_tracker(tracker):
+    """Swaps the shared tracker (e.g. FocusTracker(FakeFocusBackend()) on Linux)."""
+    global _tracker
+    with _tracker_lock:
+        _tracker = tracker
+
+if __name__ == "__main__":
+    # Test: print focus changes for 10 seconds
+    tracker = get_tracker()
+    start = time.time()
+    last = None
+    while time.time() - start < 10:
+        info = tracker.get()
+        if info != last:
+            print(f"Focus: {info['app']} | {info['title']}")
+            last = info
+        time.sleep(0.1)
+    print(f"Probes: {tracker.probes} | Changes: {tracker.generation}")
+    tracker.close()
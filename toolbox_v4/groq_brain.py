@@ -2,17 +2,29 @@ import os
 import json
 from dotenv import load_dotenv
 from groq import Groq
+import groq_resilience
+import plan_extractor
 
 # Load environment variables
 load_dotenv()
 
 API_KEY = os.getenv("GROQ_API_KEY")
 MODEL_ID = os.getenv("GROQ_MODEL", "openai/gpt-oss-120b")
+# Route sync calls through the shared async client (async_brain); "0" uses the plain sync client
+USE_ASYNC_CLIENT = os.getenv("GROQ_ASYNC", "1") == "1"
+# Print every raw model response (stdout may be shipped to Supabase, so off by default)
+DEBUG_RESPONSES = os.getenv("GROQ_DEBUG", "0") == "1"
+
+# Alternative endpoint, e.g. the offline stand-in (mock_groq_server.py)
+BASE_URL = os.getenv("GROQ_BASE_URL") or None
 
 if not API_KEY or API_KEY.startswith("gsk_replace"):
-    raise ValueError("❌ ERROR: You must set your GROQ_API_KEY in the .env file!")
+    if not BASE_URL:
+        raise ValueError("❌ ERROR: You must set your GROQ_API_KEY in the .env file!")
+    API_KEY = "offline" # Custom endpoints (local stand-ins) don't check the key
 
-client = Groq(api_key=API_KEY)
+# Retries are handled by groq_resilience (classified, rate-limit aware)
+client = Groq(api_key=API_KEY, base_url=BASE_URL, max_retries=0)
 
 SYSTEM_PROMPT = """You are a Desktop Automation Architect.
 Your job is to provide a COMPLETE, end-to-end JSON execution plan.
@@ -20,6 +32,7 @@ Your job is to provide a COMPLETE, end-to-end JSON execution plan.
 AVAILABLE ACTIONS:
 - open_app(name): Open apps, URLs, or file paths (e.g. "C:\\\\Downloads\\\\setup.exe").
 - click_text(text): Click buttons/labels.
+- click_image(name, roi): Click a text-less icon (magnifier, send arrow) from the icon library. roi [x, y, w, h] is optional.
 - type_text(text): Input text.
 - press_key(key): e.g. "enter", "ctrl+l", "pagedown".
 - wait(seconds): Use for loading screens.
@@ -39,63 +52,197 @@ RULES:
 
 import sys
 
+class JsonStepStream:
+    """
+    Incremental parser for a streamed JSON plan.
+    feed() takes raw text chunks and returns the step objects of the top-level
+    array that were completed by that chunk (<think> blocks and ``` fences are skipped).
+    The plan is only trustworthy once `complete` (closing "]" seen) with no `bad_steps`.
+    """
+    def __init__(self):
+        self.buf = ""
+        self.pos = 0 # Next unscanned char in buf
+        self.depth = 0 # Bracket depth (1 = inside the plan array)
+        self.in_string = False
+        self.escape = False
+        self.start = None # Start of the element being read
+        self.started = False
+        self.complete = False
+        self.bad_steps = 0 # Elements that didn't parse (the plan would have a gap)
+        self.steps = []
+        self.plan = None # Set by finish()
+
+    def feed(self, chunk):
+        self.buf += chunk
+        if self.complete:
+            return [] # Text after the plan (examples, notes) must never become steps
+        # Reasoning models: ignore everything until </think>
+        if "<think>" in self.buf and "</think>" not in self.buf:
+            return []
+        if not self.started and "</think>" in self.buf:
+            self.pos = max(self.pos, self.buf.index("</think>") + len("</think>"))
+
+        found = []
+        buf = self.buf
+        while self.pos < len(buf):
+            ch = buf[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif not self.started:
+                if ch == "[":
+                    self.started = True
+                    self.depth = 1
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "[{":
+                if self.depth == 1:
+                    self.start = self.pos
+                self.depth += 1
+            elif ch in "]}":
+                self.depth -= 1
+                if self.depth == 1 and self.start is not None:
+                    try:
+                        step = json.loads(buf[self.start:self.pos + 1])
+                        self.steps.append(step)
+                        found.append(step)
+                    except ValueError:
+                        self.bad_steps += 1
+                    self.start = None
+                elif self.depth == 0:
+                    if not self.steps and not self.bad_steps:
+                        # False start ("the plan [JSON]:"): keep looking for the real array
+                        self.started = False
+                    else:
+                        self.complete = True
+                        self.pos = len(buf) # Plan array closed
+                        break
+            self.pos += 1
+        return found
+
+    def finish(self, stage=None):
+        """
+        Called when the stream ends. `plan` becomes the streamed steps if the array closed
+        cleanly, else whatever plan_extractor recovers from the buffered text (None if nothing).
+        """
+        if self.complete and not self.bad_steps:
+            plan_extractor.count_clean()
+            self.plan = self.steps
+            return self.plan
+        try:
+            self.plan = plan_extractor.extract(self.buf, stage)
+        except ValueError:
+            self.plan = None
+        return self.plan
+
+def stream_action_plan(user_prompt, model_id=None, parser=None, stage=None):
+    """
+    Generator: yields each plan step as soon as the model has finished writing it.
+    Pass a JsonStepStream as `parser` to read the final plan (parser.plan) afterwards;
+    `stage` picks the expected shape if it has to be recovered from the full text.
+    """
+    target_model = model_id if model_id else MODEL_ID
+    platform_name = "macOS" if sys.platform == "darwin" else "Windows"
+    print(f"🧠 Streaming from Groq ({target_model}) | OS: {platform_name}...")
+
+    params = plan_request(user_prompt, target_model, stream=True)
+    stream = groq_resilience.get_caller().call(lambda: client.chat.completions.create(**params))
+    parser = parser or JsonStepStream()
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content or ""
+        for step in parser.feed(delta):
+            yield step
+    parser.finish(stage)
+
+def plan_request(user_prompt, model_id=None, stream=False):
+    """Request parameters for a plan completion (shared by the sync, streaming and async paths)."""
+    target_model = model_id if model_id else MODEL_ID
+    platform_name = "macOS" if sys.platform == "darwin" else "Windows"
+    full_user_prompt = f"OS: {platform_name}\nUser Goal: {user_prompt}"
+    
+    # Only use JSON mode for Llama models
+    params = {
+        "model": target_model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": full_user_prompt}
+        ],
+        "temperature": 0.0,
+        "stream": stream
+    }
+    
+    # Llama models support this flag explicitly
+    if "llama" in target_model.lower() and not stream:
+        params["response_format"] = {"type": "json_object"}
+    return params
+
+def parse_plan(response_text, stage=None):
+    """Extracts the JSON plan from the response (see plan_extractor). Raises ValueError if there is none."""
+    return plan_extractor.extract(response_text, stage)
+
 def get_raw_text(prompt, model_id=None):
     """Returns the model's response as a plain string (No JSON parsing)."""
     target_model = model_id if model_id else MODEL_ID
+
+    if USE_ASYNC_CLIENT:
+        import async_brain
+        return async_brain.get_brain().run(async_brain.get_brain().get_raw_text(prompt, target_model))
     
     try:
-        response = client.chat.completions.create(
+        response = groq_resilience.get_caller().call(lambda: client.chat.completions.create(
             model=target_model,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.0,
             stream=False
-        )
+        ))
         return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"❌ Groq Raw API Error: {e}")
         return "Error"
 
-def get_action_plan(user_prompt, model_id=None):
+def get_action_plan(user_prompt, model_id=None, on_step=None, stage=None):
+    # stage (e.g. "stage_4") picks the expected output shape when recovering JSON from a messy response
     # Allow overriding the model (e.g. use Small model for fast checks)
     target_model = model_id if model_id else MODEL_ID
+
+    # Streaming: hand each step to on_step as it arrives, return the full list at the end
+    if on_step is not None:
+        try:
+            parser = JsonStepStream()
+            for step in stream_action_plan(user_prompt, model_id=target_model, parser=parser, stage=stage):
+                on_step(step)
+            # A cut-off stream or an unparseable step would leave a truncated / gappy plan:
+            # finish() then recovers the plan from the whole buffered text instead
+            if parser.plan is not None:
+                return parser.plan
+            print(f"⚠️ Streamed plan incomplete ({len(parser.steps)} steps, closed: {parser.complete}, "
+                  f"bad steps: {parser.bad_steps}), retrying without streaming...")
+        except Exception as e:
+            print(f"❌ Groq Stream Error: {e}")
+            return None
     
     platform_name = "macOS" if sys.platform == "darwin" else "Windows"
     print(f"🧠 Sending to Groq ({target_model}) | OS: {platform_name}...")
-    
-    full_user_prompt = f"OS: {platform_name}\nUser Goal: {user_prompt}"
-    
-    # Only use JSON mode for Llama models
-    params = {
-        "model": target_model,
-        "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": full_user_prompt}
-        ],
-        "temperature": 0.0,
-        "stream": False
-    }
-    
-    # Llama models support this flag explicitly
-    if "llama" in target_model.lower():
-        params["response_format"] = {"type": "json_object"}
+
+    if USE_ASYNC_CLIENT:
+        # Shared connection pool, concurrency limit and timeout (see async_brain)
+        import async_brain
+        return async_brain.get_brain().run(async_brain.get_brain().get_action_plan(user_prompt, target_model, stage=stage))
 
     try:
-        completion = client.chat.completions.create(**params)
+        params = plan_request(user_prompt, target_model)
+        completion = groq_resilience.get_caller().call(lambda: client.chat.completions.create(**params))
         
         response_text = completion.choices[0].message.content
-        print(f"🔍 DEBUG RAW RESPONSE:\n{response_text}\n" + "-"*20) # DEBUG LINE
-        
-        # Clean up <think> tags (Reasoning models)
-        if "<think>" in response_text:
-            response_text = response_text.split("</think>")[-1].strip()
-
-        # Clean up potential markdown wrappers (```json ... ```)
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-        return json.loads(response_text)
+        if DEBUG_RESPONSES:
+            print(f"🔍 DEBUG RAW RESPONSE:\n{response_text}\n" + "-"*20)
+        return parse_plan(response_text, stage)
 
     except Exception as e:
         print(f"❌ Groq API Error: {e}")
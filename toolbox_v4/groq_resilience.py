@@ -0,0 +1,284 @@
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+import email.utils
+
+try:
+    import groq
+except ImportError:
+    groq = None
+
+# --- CONFIGURATION ---
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "4"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20.0
+# Shared request budget (requests per minute across every thread / the async loop)
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))
+GROQ_BURST = int(os.getenv("GROQ_BURST", "5"))
+# Circuit breaker: open after this many consecutive failures, probe again after the cooldown
+BREAKER_THRESHOLD = int(os.getenv("GROQ_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("GROQ_BREAKER_COOLDOWN", "30"))
+# Total time one call may spend across all its attempts and backoffs (seconds)
+GROQ_CALL_DEADLINE = float(os.getenv("GROQ_CALL_DEADLINE", os.getenv("GROQ_TIMEOUT", "90")))
+
+RETRYABLE = ("rate_limit", "server", "network", "timeout")
+# Failures that say Groq is down. A rate limit means "slow down", not an outage.
+OUTAGE = ("server", "network", "timeout")
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def classify(exc):
+    """Maps an exception to rate_limit | server | network | timeout | client | unknown."""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return "timeout"
+    if groq is not None:
+        if isinstance(exc, groq.RateLimitError):
+            return "rate_limit"
+        if isinstance(exc, groq.APITimeoutError):
+            return "timeout"
+        if isinstance(exc, groq.APIConnectionError):
+            return "network"
+        if isinstance(exc, groq.APIStatusError):
+            status = exc.status_code
+            if status == 429:
+                return "rate_limit"
+            if status >= 500 or status == 408:
+                return "server"
+            return "client"
+    status = getattr(exc, "status_code", None)
+    if status == 429:
+        return "rate_limit"
+    if status and status >= 500:
+        return "server"
+    if isinstance(exc, (ConnectionError, OSError)):
+        return "network"
+    return "unknown"
+
+
+def _parse_duration(value):
+    """'2', '1.5s', '1m3.5s', '250ms' or an HTTP date -> seconds (or None)."""
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if parts:
+        scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        return sum(float(n) * scale[u] for n, u in parts)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after(exc):
+    """Seconds the server asked us to wait (Retry-After / x-ratelimit-reset-*), or None."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        if name in headers:
+            seconds = _parse_duration(headers[name])
+            if seconds is not None:
+                return seconds
+    return None
+
+
+class TokenBucket:
+    """
+    Thread-safe request budget. reserve() books a slot and returns how long the
+    caller must wait for it, so sync threads (time.sleep) and the async loop
+    (asyncio.sleep) share the same bucket.
+    """
+    def __init__(self, rate_per_minute=GROQ_RPM, capacity=GROQ_BURST):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(wait, self.paused_until - now)
+
+    def pause(self, seconds):
+        """Server said slow down: nobody sends for `seconds`."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def check(self):
+        if self.state == "open":
+            remaining = self.cooldown - (time.monotonic() - self.opened_at)
+            raise CircuitOpenError(f"Groq circuit open ({self.failures} consecutive failures), retry in {remaining:.0f}s")
+
+    def record(self, ok):
+        """Returns True if this failure opened the circuit."""
+        with self.lock:
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return False
+            self.failures += 1
+            if self.failures >= self.threshold and self.state != "open":
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+class ResilientCaller:
+    """
+    Wraps Groq requests with classified retries (jittered exponential backoff,
+    Retry-After honoured), the shared token bucket and the circuit breaker.
+    """
+    def __init__(self, bucket=None, breaker=None, max_retries=GROQ_MAX_RETRIES, deadline=GROQ_CALL_DEADLINE):
+        self.bucket = bucket or TokenBucket()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "rate_limited": 0,
+                      "throttled_s": 0.0, "circuit_opens": 0, "failed": 0, "deadline_exceeded": 0, "errors": {}}
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def _backoff(self, attempt, exc, kind):
+        hinted = retry_after(exc)
+        if kind == "rate_limit":
+            self._count("rate_limited")
+            if hinted is not None:
+                self.bucket.pause(hinted)
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) * (0.5 + random.random())
+        return max(delay, hinted or 0.0)
+
+    def _failed(self, exc, kind, attempt, deadline):
+        """Records a failed attempt. Returns the delay before retrying, or None to give up."""
+        with self.lock:
+            self.stats["errors"][kind] = self.stats["errors"].get(kind, 0) + 1
+        if kind in RETRYABLE and attempt < self.max_retries:
+            delay = self._backoff(attempt, exc, kind)
+            if time.monotonic() + delay < deadline:
+                self._count("retries")
+                print(f"   🔁 Groq {kind} error, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                return delay
+            self._count("deadline_exceeded")
+        self._give_up(kind)
+        return None
+
+    def _give_up(self, kind):
+        """The call failed for good. Only outages count toward the breaker, once per call."""
+        self._count("failed")
+        if kind in OUTAGE and self.breaker.record(False):
+            self._count("circuit_opens")
+            print(f"   🔌 Groq circuit opened after {self.breaker.failures} failed calls")
+
+    def _remaining(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._count("deadline_exceeded")
+            self._give_up("timeout")
+            raise TimeoutError(f"Groq call exceeded its {self.deadline:.0f}s deadline")
+        return remaining
+
+    def call(self, fn):
+        """
+        Runs fn() (a blocking request) with retries within the call deadline. Raises the last error.
+        A blocking attempt can't be interrupted; the deadline stops further retries.
+        """
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            self.breaker.check()
+            wait = self.bucket.reserve()
+            if wait > 0:
+                self._count("throttled_s", wait)
+                time.sleep(min(wait, self._remaining(deadline)))
+            self._count("attempts")
+            try:
+                result = fn()
+                self.breaker.record(True)
+                return result
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                delay = self._failed(e, classify(e), attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    async def call_async(self, make_coro):
+        """
+        Async twin of call(); make_coro() must return a fresh coroutine per attempt.
+        Each attempt is also cut short when the call deadline runs out.
+        """
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            self.breaker.check()
+            wait = self.bucket.reserve()
+            if wait > 0:
+                self._count("throttled_s", wait)
+                await asyncio.sleep(min(wait, self._remaining(deadline)))
+            self._count("attempts")
+            try:
+                result = await asyncio.wait_for(make_coro(), self._remaining(deadline))
+                self.breaker.record(True)
+                return result
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                delay = self._failed(e, classify(e), attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def summary(self):
+        s = self.stats
+        errors = ", ".join(f"{k} {v}" for k, v in s["errors"].items()) or "none"
+        return (f"calls {s['calls']} | retries {s['retries']} | rate limited {s['rate_limited']} | "
+                f"throttled {s['throttled_s']:.1f}s | circuit opens {s['circuit_opens']} | failed {s['failed']} | "
+                f"deadline hit {s['deadline_exceeded']} | errors: {errors}")
+
+
+_caller = None
+_caller_lock = threading.Lock()
+
+def get_caller():
+    """Process-wide caller so every thread shares one rate limit and one breaker."""
+    global _caller
+    with _caller_lock:
+        if _caller is None:
+            _caller = ResilientCaller()
+        return _caller
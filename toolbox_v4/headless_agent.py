@@ -3,7 +3,9 @@ import io
 import time
 import json
 import threading
-from contextlib import redirect_stdout
+import atexit
+import log_shipper
+import task_scheduler
 
 # --- CONFIGURATION ---
 SUPABASE_URL = "YOUR_SUPABASE_URL"
@@ -19,37 +21,75 @@ except ImportError:
 # Initialize Supabase
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-class SupabaseStream(io.StringIO):
+class SupabaseStream(io.TextIOBase):
     """
     Custom Stream that intercepts print() statements and pushes them to the Cloud.
+    Partial writes are coalesced into whole lines; each line is queued on a
+    LogShipper, which sends batches from a background thread (print never waits on the network).
     """
-    def __init__(self, table_name="agent_logs"):
+    def __init__(self, table_name="agent_logs", max_buffer=log_shipper.LOG_QUEUE_SIZE, shipper=None, user_email=None):
         super().__init__()
-        self.table_name = table_name
+        # Per-task streams share one shipper; only the stream that created it closes it
+        self.owns_shipper = shipper is None
+        self.shipper = shipper or log_shipper.LogShipper(supabase, table_name, max_queue=max_buffer)
+        self.user_email = user_email
+        self.partial = ""
+        self.lock = threading.Lock()
+        if self.owns_shipper:
+            atexit.register(self.close)
+
+    def writable(self):
+        return True
 
     def write(self, message):
-        if message.strip(): # Ignore empty newlines
-            # 1. Print locally (so user still sees it)
-            sys.__stdout__.write(message + "
-")
-            
-            # 2. Push to Cloud (Async ideally, but sync for demo)
-            try:
-                supabase.table(self.table_name).insert({
-                    "log_message": message.strip(),
-                    "timestamp": time.time()
-                }).execute()
-            except Exception as e:
-                pass # Silent fail to avoid loops
+        # 1. Print locally (so user still sees it)
+        sys.__stdout__.write(message)
+
+        # 2. Queue complete lines for the Cloud
+        with self.lock:
+            lines = (self.partial + message).split("\n")
+            self.partial = lines.pop()
+        for line in lines:
+            self._enqueue(line)
+        return len(message)
+
+    def _enqueue(self, line):
+        if line.strip(): # Ignore empty newlines
+            record = {
+                "log_message": line.strip(),
+                "timestamp": time.time()
+            }
+            if self.user_email:
+                record["user_email"] = self.user_email
+            self.shipper.enqueue(record)
+
+    def flush(self):
+        """Queues any trailing partial line. Never waits on the network (print(flush=True), logging)."""
+        with self.lock:
+            line, self.partial = self.partial, ""
+        self._enqueue(line)
+        sys.__stdout__.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        if self.owns_shipper:
+            self.shipper.close() # Sends what's left before stopping
+        super().close()
 
 class HeadlessAgent:
     def __init__(self):
         self.running = False
         self.cloud_stream = SupabaseStream()
+        # Each worker thread's prints go to its own task's stream
+        self.router = task_scheduler.ThreadRoutedStream()
+        self.scheduler = task_scheduler.TaskScheduler(self.plan_task, self.execute_task)
 
     def start_listening(self):
         print("🤖 HEADLESS AGENT ONLINE")
         print("   Listening for commands on Supabase...")
+        sys.stdout = self.router
         
         # Subscribe to 'agent_commands' table
         channel = supabase.channel('public:agent_commands')
@@ -64,24 +104,51 @@ class HeadlessAgent:
             time.sleep(1)
 
     def handle_remote_command(self, payload):
+        """Queues the goal and returns at once, so the realtime channel is never blocked."""
         new_cmd = payload.get('new', {}).get('command')
         user = payload.get('new', {}).get('user_email')
         
         if new_cmd:
-            print(f"
-📩 REMOTE COMMAND: {new_cmd} (from {user})")
-            
-            # Execute the command and capture output
-            with redirect_stdout(self.cloud_stream):
-                self.run_task(new_cmd)
+            print(f"\n📩 REMOTE COMMAND: {new_cmd} (from {user})")
+            task = self.scheduler.submit(user, new_cmd)
+            if task is None:
+                print(f"⚠️ Queue full for {user}, dropping: {new_cmd}")
+
+    def _in_task_stream(self, task, phase):
+        """
+        Runs phase(goal) with this thread's output captured to the task's cloud stream.
+        Closing the stream only queues its last line; the shared shipper sends it in order.
+        """
+        stream = SupabaseStream(shipper=self.cloud_stream.shipper, user_email=task.user)
+        try:
+            with self.router.route(stream):
+                return phase(task.goal)
+        finally:
+            stream.close()
+
+    def plan_task(self, task):
+        # Runs on the planner pool (several goals at once)
+        return self._in_task_stream(task, self.plan_goal)
+
+    def execute_task(self, task, plan):
+        # Runs on the executor while holding the desktop lock: never wait on the network here
+        return self._in_task_stream(task, lambda goal: self.execute_goal(goal, plan))
 
     def run_task(self, goal):
+        """Plans and executes one goal on the calling thread."""
+        return self.execute_goal(goal, self.plan_goal(goal))
+
+    def plan_goal(self, goal):
         # Simulate Agent Logic (This would call agent_compiler.py)
         print(f"🧠 Analyzing Goal: '{goal}'")
         time.sleep(1)
         print("   [Stage 1] Breaking down task...")
         time.sleep(1)
         print("   [Stage 2] Searching tools...")
+        return [goal]
+
+    def execute_goal(self, goal, plan):
+        # Simulate desktop execution (This would call client_app.execute_step)
         time.sleep(1)
         print("   ✅ Task Complete.")
 
@@ -0,0 +1,259 @@
+import io
+import sys
+import time
+import json
+import base64
+import threading
+import window_utils
+
+# --- CONFIGURATION ---
+# Template scales tried (relative to the stored icon)
+SCALES = (0.75, 0.9, 1.0, 1.1, 1.25, 1.5, 2.0)
+MATCH_THRESHOLD = 0.8
+# Coarse pass keeps the template at least this many pixels on its short side
+MIN_COARSE_PX = 8
+MAX_PYRAMID_LEVELS = 3
+# Coarse candidates re-checked at full resolution
+REFINE_CANDIDATES = 3
+
+
+def _to_gray(image):
+    """PIL image or numpy array -> grayscale uint8 numpy array."""
+    import numpy as np
+    import cv2
+    if hasattr(image, "convert"):
+        return np.asarray(image.convert("L"))
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return image
+
+
+def decode_icon(image_b64):
+    from PIL import Image
+    return _to_gray(Image.open(io.BytesIO(base64.b64decode(image_b64))))
+
+
+def encode_icon(image):
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.fromarray(_to_gray(image)).save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+def _resize(image, factor):
+    import cv2
+    h, w = image.shape[:2]
+    size = (max(1, int(round(w * factor))), max(1, int(round(h * factor))))
+    interp = cv2.INTER_AREA if factor < 1 else cv2.INTER_LINEAR
+    return cv2.resize(image, size, interpolation=interp)
+
+
+def match_template(screen, template, scales=SCALES, threshold=MATCH_THRESHOLD):
+    """
+    Multi-scale template match on grayscale arrays (pixel coordinates).
+    Coarse pass on a downscaled pyramid level across all scales, then the
+    best few candidates are refined at full resolution in a small window.
+    Returns {"point": (cx, cy), "score", "scale"} or None.
+    """
+    import cv2
+    th, tw = template.shape[:2]
+
+    # Pick the deepest pyramid level that keeps the smallest template usable
+    smallest = min(th, tw) * min(scales)
+    levels = 0
+    while levels < MAX_PYRAMID_LEVELS and smallest / (2 ** (levels + 1)) >= MIN_COARSE_PX:
+        levels += 1
+    factor = 2 ** levels
+    coarse_screen = _resize(screen, 1 / factor) if levels else screen
+
+    # 1. Coarse pass
+    candidates = []
+    for scale in scales:
+        t = _resize(template, scale / factor)
+        if t.shape[0] > coarse_screen.shape[0] or t.shape[1] > coarse_screen.shape[1]:
+            continue
+        scores = cv2.matchTemplate(coarse_screen, t, cv2.TM_CCOEFF_NORMED)
+        _, best, _, loc = cv2.minMaxLoc(scores)
+        candidates.append((best, scale, loc))
+    candidates.sort(key=lambda c: c[0], reverse=True)
+
+    # 2. Refine at full resolution around each coarse hit
+    result = None
+    pad = 2 * factor + 2
+    for _, scale, (lx, ly) in candidates[:REFINE_CANDIDATES]:
+        t = _resize(template, scale)
+        h, w = t.shape[:2]
+        x0, y0 = max(0, lx * factor - pad), max(0, ly * factor - pad)
+        window = screen[y0:y0 + h + 2 * pad, x0:x0 + w + 2 * pad]
+        if window.shape[0] < h or window.shape[1] < w:
+            continue
+        scores = cv2.matchTemplate(window, t, cv2.TM_CCOEFF_NORMED)
+        _, best, _, (bx, by) = cv2.minMaxLoc(scores)
+        if best >= threshold and (result is None or best > result["score"]):
+            result = {"point": (x0 + bx + w / 2, y0 + by + h / 2), "score": float(best), "scale": scale}
+    return result
+
+
+def find_image(template, screenshot=None, roi=None, threshold=MATCH_THRESHOLD):
+    """
+    Locates an icon template on screen. `roi` = (x, y, w, h) in screen points
+    restricts the search. Returns {"point": (x, y) in screen points, "score", "scale"} or None.
+    """
+    import pyautogui
+    if screenshot is None:
+        screenshot = pyautogui.screenshot()
+    screen = _to_gray(screenshot)
+
+    # Retina Scaling Correction
+    screen_w, _ = pyautogui.size()
+    px_per_pt = screen.shape[1] / screen_w
+
+    ox, oy = 0, 0
+    if roi:
+        rx, ry, rw, rh = [int(v * px_per_pt) for v in roi]
+        ox, oy = max(0, rx), max(0, ry)
+        screen = screen[oy:ry + rh, ox:rx + rw]
+
+    match = match_template(screen, _to_gray(template), threshold=threshold)
+    if not match:
+        return None
+    px, py = match["point"]
+    match["point"] = ((px + ox) / px_per_pt, (py + oy) / px_per_pt)
+
+    # Ignore hits on the HUD / Terminal
+    if window_utils.is_point_in_rects(match["point"][0], match["point"][1], window_utils.get_exclusion_rects()):
+        return None
+    return match
+
+
+_db = None
+_db_lock = threading.Lock()
+
+def get_db():
+    """Process-wide icon library, so a click doesn't reload icon_memory.json (or reconnect to Supabase)."""
+    global _db
+    with _db_lock:
+        if _db is None:
+            import toolbox_db
+            _db = toolbox_db.ToolboxDB()
+        return _db
+
+
+def click_image(name, roi=None, db=None):
+    """Clicks the icon stored as `name` in the ToolboxDB icon library."""
+    import pyautogui
+    db = db or get_db()
+
+    print(f"   🖼️  [IMAGE] Looking for icon '{name}'...")
+    image_b64 = db.get_icon(name)
+    if not image_b64:
+        print(f"   ❌ Icon '{name}' not in library.")
+        return False
+
+    start = time.time()
+    match = find_image(decode_icon(image_b64), roi=roi)
+    if not match:
+        print(f"   ❌ Icon '{name}' not found on screen.")
+        return False
+
+    x, y = match["point"]
+    print(f"   ✨ Icon '{name}' at ({int(x)}, {int(y)}) score {match['score']:.2f} scale {match['scale']} in {(time.time() - start) * 1000:.0f}ms")
+    pyautogui.moveTo(x, y, duration=0.5)
+    pyautogui.click()
+    return True
+
+
+def capture_icon(name, region, description="", db=None):
+    """Grabs region (x, y, w, h in screen points) and stores it as an icon template."""
+    import pyautogui
+    db = db or get_db()
+    image = pyautogui.screenshot(region=tuple(int(v) for v in region))
+    db.save_icon(name, encode_icon(image), description)
+
+
+# --- BENCHMARK ---
+
+def synthetic_cases(count=20, seed=0, negatives=0.25):
+    """
+    Pastes a random icon into noisy 1440x900 'screenshots' at known spots and scales.
+    A `negatives` share of the screens don't contain it (expected None), to count false positives.
+    """
+    import numpy as np
+    import cv2
+    rng = np.random.default_rng(seed)
+    cases = []
+    for _ in range(count):
+        icon = np.full((24, 24), 240, np.uint8)
+        cv2.circle(icon, (10, 10), 6, 40, 2)
+        cv2.line(icon, (14, 14), (21, 21), 40, 2)
+        icon = icon.copy()
+        icon[rng.integers(0, 24, 20), rng.integers(0, 24, 20)] = 128
+
+        screen = (rng.random((900, 1440)) * 60 + 150).astype(np.uint8)
+        if rng.random() < negatives:
+            cases.append({"screen": screen, "icon": icon, "expected": None})
+            continue
+        scale = float(rng.choice([1.0, 1.25, 2.0]))
+        placed = _resize(icon, scale)
+        h, w = placed.shape
+        x, y = int(rng.integers(0, 1440 - w)), int(rng.integers(0, 900 - h))
+        screen[y:y + h, x:x + w] = placed
+        cases.append({"screen": screen, "icon": icon, "expected": (x + w / 2, y + h / 2)})
+    return cases
+
+
+def load_cases(path):
+    """Fixture file: [{"screenshot": path, "icon": path, "expected": [x, y] or null if absent}] (pixels)."""
+    from PIL import Image
+    with open(path, "r") as f:
+        fixtures = json.load(f)
+    return [{
+        "screen": _to_gray(Image.open(c["screenshot"])),
+        "icon": _to_gray(Image.open(c["icon"])),
+        "expected": tuple(c["expected"]) if c.get("expected") else None
+    } for c in fixtures]
+
+
+def benchmark(cases, runs=3, tolerance=4):
+    """
+    Reports mean/max match time, precision (matches that land within tolerance px of the icon,
+    out of all matches returned) and recall (icons found, out of screens that contain one).
+    """
+    times, found, wrong, missed = [], 0, 0, 0
+    for case in cases:
+        for _ in range(runs):
+            start = time.perf_counter()
+            match = match_template(case["screen"], case["icon"])
+            times.append((time.perf_counter() - start) * 1000)
+        expected = case["expected"]
+        if not match:
+            missed += expected is not None
+            continue
+        if expected is None:
+            wrong += 1 # Matched a screen without the icon
+            continue
+        dx = match["point"][0] - expected[0]
+        dy = match["point"][1] - expected[1]
+        if (dx * dx + dy * dy) ** 0.5 <= tolerance:
+            found += 1
+        else:
+            wrong += 1 # Matched the wrong spot: a false positive and a miss
+            missed += 1
+    report = {
+        "cases": len(cases),
+        "precision": found / (found + wrong) if found + wrong else 0.0,
+        "recall": found / (found + missed) if found + missed else 0.0,
+        "false_positives": wrong,
+        "mean_ms": sum(times) / len(times) if times else 0.0,
+        "max_ms": max(times) if times else 0.0,
+    }
+    print(f"📊 click_image benchmark: {report['cases']} cases | precision {report['precision']:.0%} | "
+          f"recall {report['recall']:.0%} | false positives {wrong} | "
+          f"mean {report['mean_ms']:.1f}ms | max {report['max_ms']:.1f}ms")
+    return report
+
+
+if __name__ == "__main__":
+    # Usage: python image_search.py [fixtures.json]
+    cases = load_cases(sys.argv[1]) if len(sys.argv) > 1 else synthetic_cases()
+    benchmark(cases)
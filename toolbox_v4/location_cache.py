@@ -0,0 +1,159 @@
+import os
+import re
+import io
+import json
+import time
+import base64
+import threading
+import debounced_save
+
+# --- CONFIGURATION ---
+LOCATION_MEMORY_FILE = "location_memory.json"
+# Patch captured around a target (screen points)
+PATCH_W = 64
+PATCH_H = 28
+# Extra pixels searched around the cached spot to absorb small layout shifts
+SEARCH_MARGIN = 12
+# Minimum normalized correlation for a cached patch to count as "still there"
+MATCH_THRESHOLD = float(os.getenv("LOCATION_MATCH_THRESHOLD", "0.9"))
+# Patches flatter than this (grayscale std-dev) can't be verified, so aren't cached
+MIN_PATCH_STD = 8.0
+# Writes are batched: the file is rewritten at most once per SAVE_DELAY seconds (and at exit)
+SAVE_DELAY = debounced_save.SAVE_DELAY
+
+
+def title_pattern(title):
+    """
+    Normalizes a window title so volatile parts don't split the cache:
+    "(3) WhatsApp" and "(12) WhatsApp" both become "(#) whatsapp".
+    """
+    pattern = re.sub(r"\d+", "#", (title or "").lower())
+    return " ".join(pattern.split())
+
+
+def grab_region(left, top, width, height):
+    """Grayscale numpy array of a screen region (region-only capture, no full screenshot)."""
+    import numpy as np
+    from PIL import ImageGrab
+    image = ImageGrab.grab(bbox=(int(left), int(top), int(left + width), int(top + height)))
+    return np.asarray(image.convert("L"))
+
+
+def _encode(patch):
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.fromarray(patch).save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+def _decode(data):
+    import numpy as np
+    from PIL import Image
+    return np.asarray(Image.open(io.BytesIO(base64.b64decode(data))).convert("L"))
+
+
+class LocationCache:
+    """
+    Remembers where targets were last found, keyed by
+    (app, window title pattern, target text, screen size).
+    A hit is only trusted after the stored image patch is found again at
+    (or within SEARCH_MARGIN of) the cached position.
+    """
+    def __init__(self, memory_file=LOCATION_MEMORY_FILE, grab=grab_region, save_delay=SAVE_DELAY):
+        self.memory_file = memory_file
+        self.grab = grab
+        self.lock = threading.Lock()
+        self.entries = self._load()
+        self.hits = 0
+        self.misses = 0
+        self.saver = debounced_save.DebouncedSave(memory_file, lambda: self.entries, self.lock, save_delay)
+
+    def _load(self):
+        if not self.memory_file or not os.path.exists(self.memory_file): return {}
+        try:
+            with open(self.memory_file, 'r') as f: return json.load(f)
+        except: return {}
+
+    def _save(self):
+        """Schedules a write off the click path (call with self.lock held)."""
+        self.saver.schedule()
+
+    def flush(self):
+        """Writes pending changes now."""
+        self.saver.flush()
+
+    def key(self, app, title, text, screen_size):
+        return f"{app}|{title_pattern(title)}|{text.lower()}|{screen_size[0]}x{screen_size[1]}"
+
+    def recall(self, app, title, text, screen_size):
+        """Returns a verified (x, y) for the target, or None (stale entries are dropped)."""
+        key = self.key(app, title, text, screen_size)
+        with self.lock:
+            entry = self.entries.get(key)
+        if not entry:
+            return None
+
+        point = self.verify(entry)
+        with self.lock:
+            if point:
+                self.hits += 1
+                entry["hits"] = entry.get("hits", 0) + 1
+                entry["point"] = list(point)
+            else:
+                self.misses += 1
+                self.entries.pop(key, None)
+            self._save()
+        return point
+
+    def verify(self, entry):
+        """Template-matches the stored patch in a small window around the cached spot."""
+        import cv2
+        try:
+            patch = _decode(entry["patch"])
+            x, y = entry["point"]
+            left = x - PATCH_W / 2 - SEARCH_MARGIN
+            top = y - PATCH_H / 2 - SEARCH_MARGIN
+            region = self.grab(left, top, PATCH_W + 2 * SEARCH_MARGIN, PATCH_H + 2 * SEARCH_MARGIN)
+        except Exception as e:
+            print(f"   ⚠️  Location cache verify failed: {e}")
+            return None
+        if region.shape[0] < patch.shape[0] or region.shape[1] < patch.shape[1]:
+            return None
+
+        scores = cv2.matchTemplate(region, patch, cv2.TM_CCOEFF_NORMED)
+        _, best, _, (bx, by) = cv2.minMaxLoc(scores)
+        if best < MATCH_THRESHOLD:
+            return None
+
+        # Patch pixels may be denser than screen points (Retina); map the offset back
+        px_per_pt = region.shape[1] / (PATCH_W + 2 * SEARCH_MARGIN)
+        dx = bx / px_per_pt - SEARCH_MARGIN
+        dy = by / px_per_pt - SEARCH_MARGIN
+        return (x + dx, y + dy)
+
+    def remember(self, app, title, text, screen_size, point):
+        """Captures the patch around point and stores it (call before clicking)."""
+        x, y = point
+        try:
+            patch = self.grab(x - PATCH_W / 2, y - PATCH_H / 2, PATCH_W, PATCH_H)
+        except Exception as e:
+            print(f"   ⚠️  Location cache capture failed: {e}")
+            return False
+        if patch.size == 0 or patch.std() < MIN_PATCH_STD:
+            return False # Too uniform to verify later
+
+        key = self.key(app, title, text, screen_size)
+        with self.lock:
+            self.entries[key] = {
+                "point": [x, y],
+                "patch": _encode(patch),
+                "hits": 0,
+                "timestamp": time.time()
+            }
+            self._save()
+        return True
+
+    def forget(self, app, title, text, screen_size):
+        with self.lock:
+            self.entries.pop(self.key(app, title, text, screen_size), None)
+            self._save()
@@ -0,0 +1,144 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+import groq_resilience
+
+# --- CONFIGURATION ---
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "2000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "50"))
+# Max seconds a line waits before its batch is sent
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "0.5"))
+LOG_MAX_RETRIES = 5
+# Postgres error classes worth retrying: connection, transaction rollback, resources, shutdown
+TRANSIENT_PG_CLASSES = ("08", "40", "53", "57")
+# PostgREST codes for "database unreachable" (the rest are request errors)
+TRANSIENT_PGRST_CODES = ("PGRST000", "PGRST001", "PGRST002", "PGRST003")
+RETRYABLE = groq_resilience.RETRYABLE + ("unknown",)
+
+
+def classify(exc):
+    """
+    groq_resilience.classify, plus PostgREST errors, which carry a code instead of a status:
+    a missing column, bad payload or denied insert is "client" and won't succeed on retry.
+    """
+    code = getattr(exc, "code", None)
+    if isinstance(code, str) and code:
+        if code.startswith("PGRST"):
+            return "server" if code in TRANSIENT_PGRST_CODES else "client"
+        if len(code) == 5:
+            return "server" if code[:2] in TRANSIENT_PG_CLASSES else "client"
+    status = getattr(exc, "status_code", None)
+    if status and 400 <= status < 500 and status not in (408, 429):
+        return "client"
+    return groq_resilience.classify(exc)
+
+
+class LogShipper:
+    """
+    Ships log records to a Supabase table from a background thread.
+    - enqueue() never blocks: the queue is bounded and drops the OLDEST record on overflow.
+    - Records go out as one bulk insert per batch (size- or time-triggered).
+    - Failed batches are retried with jittered exponential backoff, then dropped;
+      client errors (bad column, auth) are dropped at once.
+    """
+    def __init__(self, client, table_name="agent_logs", max_queue=LOG_QUEUE_SIZE,
+                 batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL, max_retries=LOG_MAX_RETRIES):
+        self.client = client
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.queue = deque(maxlen=max_queue)
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.flushing = False
+        self.closed = False
+        self.stats = {"enqueued": 0, "sent": 0, "dropped": 0, "failed": 0, "retries": 0, "batches": 0, "errors": {}}
+
+        self.worker = threading.Thread(target=self._run, name="log-shipper")
+        self.worker.daemon = True
+        self.worker.start()
+
+    def enqueue(self, record):
+        """Queues one row (dict). Returns immediately."""
+        with self.cond:
+            if self.closed:
+                return
+            if len(self.queue) == self.queue.maxlen:
+                self.stats["dropped"] += 1 # deque drops the oldest for us
+            self.queue.append(record)
+            self.stats["enqueued"] += 1
+            if len(self.queue) == 1 or len(self.queue) >= self.batch_size:
+                self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                # Wait for a first record, then for a full batch, the flush interval, a flush or shutdown
+                while not self.queue and not self.closed:
+                    self.cond.wait()
+                deadline = time.time() + self.flush_interval
+                while len(self.queue) < self.batch_size and not (self.closed or self.flushing):
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                if not self.queue: # Closed
+                    return
+                batch = [self.queue.popleft() for _ in range(min(self.batch_size, len(self.queue)))]
+                self.in_flight = len(batch)
+            self._send(batch)
+            with self.cond:
+                self.in_flight = 0
+                self.cond.notify_all()
+
+    def _send(self, batch):
+        delay = 0.5
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.client.table(self.table_name).insert(batch).execute()
+                self.stats["sent"] += len(batch)
+                self.stats["batches"] += 1
+                return True
+            except Exception as e:
+                kind = classify(e)
+                self.stats["errors"][kind] = self.stats["errors"].get(kind, 0) + 1
+                if kind not in RETRYABLE or attempt == self.max_retries or self.closed:
+                    break
+                self.stats["retries"] += 1
+                time.sleep(delay * (0.5 + random.random()))
+                delay = min(delay * 2, 10.0)
+        # Silent fail to keep the agent running
+        self.stats["failed"] += len(batch)
+        return False
+
+    def flush(self, timeout=5.0):
+        """Blocks until everything queued so far has been sent (or timeout)."""
+        deadline = time.time() + timeout
+        with self.cond:
+            self.flushing = True
+            self.cond.notify_all()
+            try:
+                while (self.queue or self.in_flight) and self.worker.is_alive():
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    self.cond.wait(remaining)
+            finally:
+                self.flushing = False
+        return True
+
+    def close(self, timeout=5.0):
+        """Flushes and stops the background thread."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.worker.join(timeout)
+
+    def summary(self):
+        s = self.stats
+        errors = ", ".join(f"{k} {v}" for k, v in s["errors"].items()) or "none"
+        return (f"sent {s['sent']} | dropped {s['dropped']} | failed {s['failed']} | retries {s['retries']} | "
+                f"batches {s['batches']} | errors: {errors}")
@@ -0,0 +1,228 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# --- CONFIGURATION ---
+MOCK_GROQ_PORT = int(os.getenv("MOCK_GROQ_PORT", "54330"))
+# Optional JSON file with a list of fixtures (replaces the defaults below)
+MOCK_GROQ_FIXTURES = os.getenv("MOCK_GROQ_FIXTURES")
+# Multiplies every fixture latency (0 = as fast as possible)
+MOCK_GROQ_LATENCY_SCALE = float(os.getenv("MOCK_GROQ_LATENCY_SCALE", "1.0"))
+STREAM_CHUNK_CHARS = 24
+
+# Fixtures are tried in order; the first whose `match` regex is found in the
+# request's messages answers it. Fields:
+#   match      regex searched in all message contents (case-insensitive)
+#   model      optional regex the requested model must match
+#   content    reply text (non-string values are sent as JSON)
+#   latency    seconds before the reply (time to first chunk when streaming)
+#   jitter     extra random 0..jitter seconds
+#   chunk_delay seconds between streamed chunks
+#   status     reply with this HTTP error instead (e.g. 429, 503)
+#   headers    extra response headers (e.g. {"retry-after": "1"})
+#   times      only answer the first n matching requests, then fall through
+DEFAULT_FIXTURES = [
+    {"name": "stage_1", "match": r"break the main task into", "latency": 0.6,
+     "content": ["Open Browser", "Search for Nvidia", "Extract Price", "Save to Notes"]},
+    {"name": "stage_2", "match": r"search a tool database", "latency": 0.3,
+     "content": ["nvidia", "stock", "price", "browser", "notes"]},
+    {"name": "stage_4", "match": r"create a final execution plan", "latency": 1.2, "chunk_delay": 0.02,
+     "content": "Here is the plan:\n```json\n" + json.dumps([
+         {"action": "call_tool", "name": "open_browser", "params": {"browser": "Brave"}},
+         {"action": "navigate", "url": "https://www.google.com/search?q=nvidia+stock"},
+         {"action": "wait", "seconds": 2},
+         {"action": "extract_info", "description": "the Nvidia stock price"},
+         {"action": "call_tool", "name": "open_browser", "params": {"browser": "Brave"}},
+         {"action": "open_app", "name": "Notes"},
+         {"action": "type_text", "text": "$LAST_READ"}
+     ], indent=1) + "\n```"},
+    {"name": "stage_5", "match": r"fix the error|Rewrite ONLY the remaining", "latency": 0.8,
+     "content": [{"action": "click_near", "target": "Nvidia", "anchor": "Google"},
+                 {"action": "extract_info", "description": "the Nvidia stock price"}]},
+    {"name": "stage_6", "match": r"generalized Tool definition", "latency": 0.8,
+     "content": {"name": "search_stock_price", "description": "Searches a stock price and saves it to Notes",
+                 "parameters": ["query"],
+                 "body": [{"action": "navigate", "url": "https://www.google.com/search?q={query}"},
+                          {"action": "extract_info", "description": "the {query} price"}]}},
+    {"name": "extract_info", "match": r"RAW OCR TEXT", "latency": 0.2, "content": "182.45"},
+    {"name": "plan", "match": r"User Goal:", "latency": 0.8,
+     "content": [{"action": "open_app", "name": "Brave"}, {"action": "wait", "seconds": 5}]},
+]
+
+
+def load_fixtures(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+class FixtureBook:
+    """Matches requests to fixtures and keeps serving stats (hits, peak concurrency)."""
+    def __init__(self, fixtures=None, latency_scale=MOCK_GROQ_LATENCY_SCALE):
+        self.latency_scale = latency_scale
+        self.lock = threading.Lock()
+        self.fixtures = []
+        for i, fixture in enumerate(fixtures if fixtures is not None else DEFAULT_FIXTURES):
+            entry = dict(fixture, hits=0)
+            entry.setdefault("name", f"fixture_{i}")
+            entry["_match"] = re.compile(fixture.get("match", "."), re.I | re.S)
+            entry["_model"] = re.compile(fixture["model"]) if fixture.get("model") else None
+            self.fixtures.append(entry)
+        self.requests = 0
+        self.unmatched = 0
+        self.inflight = 0
+        self.peak_inflight = 0
+
+    def match(self, prompt, model):
+        with self.lock:
+            self.requests += 1
+            for fixture in self.fixtures:
+                if fixture.get("times") is not None and fixture["hits"] >= fixture["times"]:
+                    continue
+                if fixture["_model"] and not fixture["_model"].search(model or ""):
+                    continue
+                if fixture["_match"].search(prompt):
+                    fixture["hits"] += 1
+                    return fixture
+            self.unmatched += 1
+            return None
+
+    def enter(self):
+        with self.lock:
+            self.inflight += 1
+            self.peak_inflight = max(self.peak_inflight, self.inflight)
+
+    def leave(self):
+        with self.lock:
+            self.inflight -= 1
+
+    def delay(self, fixture):
+        return (fixture.get("latency", 0.0) + random.random() * fixture.get("jitter", 0.0)) * self.latency_scale
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = self.unmatched = self.peak_inflight = 0
+            for fixture in self.fixtures:
+                fixture["hits"] = 0
+
+    def summary(self):
+        hits = ", ".join(f"{f['name']} {f['hits']}" for f in self.fixtures if f["hits"])
+        return (f"requests {self.requests} | peak in-flight {self.peak_inflight} | "
+                f"unmatched {self.unmatched} | hits: {hits or 'none'}")
+
+
+class Handler(BaseHTTPRequestHandler):
+    """OpenAI-compatible subset of the Groq API: POST /openai/v1/chat/completions (plain or SSE)."""
+    book = None
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real API
+
+    def _reply(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/openai/v1/models":
+            models = sorted({f.get("model") or "mock" for f in self.book.fixtures})
+            return self._reply(200, {"object": "list", "data": [{"id": m, "object": "model"} for m in models]})
+        self._reply(404, {"error": {"message": "not found", "type": "not_found"}})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.rstrip("/") != "/openai/v1/chat/completions":
+            return self._reply(404, {"error": {"message": "not found", "type": "not_found"}})
+
+        model = request.get("model", "mock")
+        prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+        fixture = self.book.match(prompt, model)
+        if fixture is None:
+            return self._reply(400, {"error": {"message": "No mock fixture matches this prompt",
+                                               "type": "invalid_request_error"}})
+
+        self.book.enter()
+        try:
+            time.sleep(self.book.delay(fixture))
+            if fixture.get("status"):
+                return self._reply(fixture["status"], {"error": {"message": f"Mock {fixture['status']} ({fixture['name']})",
+                                                                 "type": "mock_error"}}, fixture.get("headers"))
+            content = fixture.get("content", "")
+            if not isinstance(content, str):
+                content = json.dumps(content)
+            if request.get("stream"):
+                self._stream(model, content, fixture)
+            else:
+                self._reply(200, {
+                    "id": f"mock-{self.book.requests}", "object": "chat.completion", "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                              "total_tokens": (len(prompt) + len(content)) // 4},
+                }, fixture.get("headers"))
+        finally:
+            self.book.leave()
+
+    def _stream(self, model, content, fixture):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close") # No Content-Length: the end of the stream closes it
+        self.end_headers()
+        chunk_delay = fixture.get("chunk_delay", 0.0) * self.book.latency_scale
+
+        def event(delta, finish=None):
+            payload = {"id": "mock-stream", "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+            self.wfile.flush()
+
+        event({"role": "assistant", "content": ""})
+        for i in range(0, len(content), STREAM_CHUNK_CHARS):
+            event({"content": content[i:i + STREAM_CHUNK_CHARS]})
+            if chunk_delay:
+                time.sleep(chunk_delay)
+        event({}, finish="stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass # Keep the console clean
+
+
+def start_server(port=MOCK_GROQ_PORT, fixtures=None, latency_scale=MOCK_GROQ_LATENCY_SCALE):
+    """
+    Starts the stand-in on a background thread. Returns (server, book, url).
+    Point the pipeline at it with GROQ_BASE_URL=<url> (any GROQ_API_KEY works).
+    """
+    if fixtures is None and MOCK_GROQ_FIXTURES:
+        fixtures = load_fixtures(MOCK_GROQ_FIXTURES)
+    book = FixtureBook(fixtures, latency_scale)
+    handler = type("BoundHandler", (Handler,), {"book": book})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    t = threading.Thread(target=server.serve_forever, name="mock-groq")
+    t.daemon = True
+    t.start()
+    return server, book, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    # Usage: python mock_groq_server.py [port]
+    # Then run the agent with GROQ_BASE_URL=http://127.0.0.1:<port> GROQ_API_KEY=offline
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else MOCK_GROQ_PORT
+    server, book, url = start_server(port)
+    print(f"🧪 Mock Groq at {url} ({len(book.fixtures)} fixtures, latency x{book.latency_scale})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print(f"\n🛑 Stopped. {book.summary()}")
+        server.shutdown()
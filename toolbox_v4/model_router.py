@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import threading
+import debounced_save
+
+# --- CONFIGURATION ---
+MODEL_STATS_FILE = "model_stats.json"
+MODEL_LARGE = os.getenv("GROQ_MODEL", "openai/gpt-oss-120b")
+MODEL_SMALL = os.getenv("GROQ_MODEL_SMALL", "openai/gpt-oss-20b")
+# Tier per stage / task class; override with MODEL_ROUTES="stage_2=large,extract_info=small"
+DEFAULT_ROUTES = {
+    "stage_1": "large",
+    "stage_2": "small", # Keyword list
+    "stage_4": "large",
+    "stage_5": "large",
+    "stage_6": "large",
+    "extract_info": "small", # Pick one value out of OCR text
+}
+
+
+def _load_routes():
+    routes = dict(DEFAULT_ROUTES)
+    for pair in os.getenv("MODEL_ROUTES", "").split(","):
+        if "=" in pair:
+            task, tier = pair.split("=", 1)
+            routes[task.strip()] = tier.strip()
+    return routes
+
+
+# --- VALIDATORS (output shape per task) ---
+
+def is_string_list(result):
+    return isinstance(result, list) and bool(result) and all(isinstance(x, str) for x in result)
+
+def is_action_list(result):
+    return isinstance(result, list) and bool(result) and all(isinstance(x, dict) and x.get("action") for x in result)
+
+def is_tool_definition(result):
+    return isinstance(result, dict) and "name" in result and isinstance(result.get("body"), list)
+
+def is_short_value(result):
+    return isinstance(result, str) and bool(result.strip()) and result != "Error" and len(result) < 200
+
+VALIDATORS = {
+    "stage_1": is_string_list,
+    "stage_2": is_string_list,
+    "stage_4": is_action_list,
+    "stage_5": is_action_list,
+    "stage_6": is_tool_definition,
+    "extract_info": is_short_value,
+}
+
+
+class ModelRouter:
+    """
+    Picks a model per stage/task from a small/large tier table.
+    If the small model's output fails the task's validator, the call is
+    retried once on the large model. Latency and validity are recorded per
+    (task, model) in model_stats.json so the tiers can be tuned with data
+    (written in batches, off the LLM call path).
+    """
+    def __init__(self, routes=None, small=MODEL_SMALL, large=MODEL_LARGE, stats_file=MODEL_STATS_FILE,
+                 save_delay=debounced_save.SAVE_DELAY):
+        self.routes = routes or _load_routes()
+        self.models = {"small": small, "large": large}
+        self.stats_file = stats_file
+        self.lock = threading.Lock()
+        self.stats = self._load()
+        self.saver = debounced_save.DebouncedSave(stats_file, lambda: self.stats, self.lock, save_delay)
+
+    def _load(self):
+        if not self.stats_file or not os.path.exists(self.stats_file): return {}
+        try:
+            with open(self.stats_file, 'r') as f: return json.load(f)
+        except: return {}
+
+    def _save(self):
+        """Schedules a write (call with self.lock held)."""
+        self.saver.schedule()
+
+    def flush(self):
+        """Writes pending stats now."""
+        self.saver.flush()
+
+    def model_for(self, task):
+        tier = self.routes.get(task, "large")
+        return self.models.get(tier, tier) # Unknown tier names are taken as model ids
+
+    def record(self, task, model, seconds, valid, escalated=False):
+        with self.lock:
+            entry = self.stats.setdefault(task, {}).setdefault(model, {
+                "calls": 0, "valid": 0, "escalations": 0, "total_s": 0.0
+            })
+            entry["calls"] += 1
+            entry["valid"] += int(valid)
+            entry["escalations"] += int(escalated)
+            entry["total_s"] = round(entry["total_s"] + seconds, 3)
+            self._save()
+
+    def call(self, task, fn, validate=None, on_escalate=None):
+        """
+        Runs fn(model_id) on the task's model. Invalid small-model output escalates
+        to the large model; on_escalate() runs first (e.g. to reset a streamed preview).
+        Returns the last result (valid or not).
+        """
+        validate = validate or VALIDATORS.get(task, lambda r: r is not None)
+        model = self.model_for(task)
+        start = time.time()
+        result = fn(model)
+        valid = bool(validate(result))
+        escalate = not valid and model != self.models["large"]
+        self.record(task, model, time.time() - start, valid, escalated=escalate)
+        if not escalate:
+            return result
+
+        print(f"   ⬆️  [{task}] {model} output failed validation, escalating to {self.models['large']}")
+        if on_escalate:
+            on_escalate()
+        start = time.time()
+        result = fn(self.models["large"])
+        self.record(task, self.models["large"], time.time() - start, bool(validate(result)))
+        return result
+
+    def report(self):
+        """Per task and model: calls, validity rate, mean latency."""
+        lines = []
+        for task, models in sorted(self.stats.items()):
+            for model, s in models.items():
+                mean = s["total_s"] / s["calls"] if s["calls"] else 0.0
+                lines.append(f"{task:<13} {model:<28} calls {s['calls']:>4} | valid {s['valid'] / max(1, s['calls']):.0%} "
+                             f"| escalated {s['escalations']} | mean {mean:.2f}s")
+        return "\n".join(lines)
+
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_router():
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
+
+
+if __name__ == "__main__":
+    # Usage: python model_router.py  -> prints collected tier stats
+    print(get_router().report() or "No model stats yet.")
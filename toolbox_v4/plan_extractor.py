@@ -0,0 +1,164 @@
+import re
+import json
+import threading
+import model_router
+import toolbox_logger
+
+# Fixes applied (in order) to a candidate that doesn't parse as-is
+REPAIRS = (
+    ("smart quotes", lambda s: s.replace("“", '"').replace("”", '"').replace("‘", "'").replace("’", "'")),
+    ("comments", lambda s: re.sub(r'(?m)^\s*//.*$|(?<=[,\[{])\s*//[^\n]*', "", s)),
+    ("trailing commas", lambda s: re.sub(r",\s*([\]}])", r"\1", s)),
+)
+
+_lock = threading.Lock()
+# clean: the response was the JSON | recovered: found inside other text | repaired: needed REPAIRS
+# invalid: parsed, but nothing matched the stage's schema | failed: no JSON at all
+stats = {"clean": 0, "recovered": 0, "repaired": 0, "invalid": 0, "failed": 0}
+
+
+def _count(key):
+    with _lock:
+        stats[key] += 1
+
+
+def count_clean():
+    """For callers that parsed a clean response themselves (the streaming step parser)."""
+    _count("clean")
+
+
+def strip_reasoning(text):
+    """Drops <think>...</think> blocks (reasoning models)."""
+    if "</think>" in text:
+        text = text.split("</think>")[-1]
+    return text.strip()
+
+
+def scan_candidates(text):
+    """
+    Balanced-bracket scan: every top-level [...] / {...} span in the text,
+    string-aware (brackets inside "..." don't count). Unclosed spans are dropped.
+    """
+    spans = []
+    depth = 0
+    start = None
+    in_string = False
+    escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"' and depth:
+            in_string = True
+        elif ch in "[{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch in "]}" and depth:
+            depth -= 1
+            if depth == 0:
+                spans.append(text[start:i + 1])
+    return spans
+
+
+def _parse(candidate):
+    """Returns (value, repaired) or raises ValueError."""
+    try:
+        return json.loads(candidate), False
+    except ValueError:
+        pass
+    fixed = candidate
+    for _, repair in REPAIRS:
+        fixed = repair(fixed)
+        try:
+            return json.loads(fixed), True
+        except ValueError:
+            continue
+    raise ValueError("unparseable candidate")
+
+
+def _variants(value):
+    """The value itself plus list values of a wrapper object ({"plan": [...]} from JSON mode)."""
+    yield value
+    if isinstance(value, dict):
+        for v in value.values():
+            if isinstance(v, list):
+                yield v
+
+
+def extract(text, stage=None):
+    """
+    Recovers the JSON answer from a model response without another request.
+    Candidates come from the whole text, ``` fences and a balanced-bracket scan;
+    each gets light repairs if needed. With a stage, the stage's schema
+    (model_router.VALIDATORS) picks among candidates; otherwise the largest wins.
+    Raises ValueError if nothing parses.
+    """
+    validate = model_router.VALIDATORS.get(stage) if stage else None
+    body = strip_reasoning(text or "")
+
+    # Fast path: the response is exactly the JSON
+    try:
+        value = json.loads(body)
+        if validate is None or validate(value):
+            _count("clean")
+            return value
+    except ValueError:
+        pass
+
+    candidates = re.findall(r"```(?:json)?\s*(.*?)```", body, re.S) + scan_candidates(body)
+    parsed = [] # (valid, size, repaired, value)
+    for candidate in candidates:
+        try:
+            value, repaired = _parse(candidate.strip())
+        except ValueError:
+            continue
+        for variant in _variants(value):
+            valid = validate(variant) if validate else True
+            parsed.append((bool(valid), len(candidate), repaired, variant))
+
+    if not parsed:
+        _count("failed")
+        toolbox_logger.log_action("PLAN_EXTRACT", {"stage": stage, "result": "failed", "chars": len(body)})
+        raise ValueError(f"No JSON found in response ({len(body)} chars)")
+
+    valid, _, repaired, value = max(parsed, key=lambda p: (p[0], p[1]))
+    if not valid:
+        outcome = "invalid"
+    else:
+        outcome = "repaired" if repaired else "recovered"
+    _count(outcome)
+    toolbox_logger.log_action("PLAN_EXTRACT", {
+        "stage": stage, "result": outcome, "candidates": len(candidates), "schema_ok": valid
+    })
+    if validate and not valid:
+        print(f"   ⚠️  [{stage}] Extracted JSON doesn't match the expected shape")
+    return value
+
+
+def summary():
+    s = stats
+    return (f"clean {s['clean']} | recovered {s['recovered']} | repaired {s['repaired']} | "
+            f"invalid {s['invalid']} | failed {s['failed']}")
+
+
+if __name__ == "__main__":
+    # Usage: python plan_extractor.py  -> runs the extractor over typical messy responses
+    samples = [
+        ("stage_4", '[{"action": "wait", "seconds": 1}]'),
+        ("stage_4", 'Here is the plan:\n```json\n[{"action": "press_key", "key": "enter"},]\n```'),
+        ("stage_2", '<think>["draft"]</think> Keywords: ["nvidia", "stock"] as requested.'),
+        ("stage_4", '{"plan": [{"action": "open_app", "name": "Notes"}]}'),
+        ("stage_4", '["Open Notes", "Type the price"]'),
+        ("stage_4", 'Sorry, I cannot help with that.'),
+    ]
+    for stage, text in samples:
+        try:
+            print(f"✅ {stage}: {json.dumps(extract(text, stage))}")
+        except ValueError as e:
+            print(f"❌ {stage}: {e}")
+    print(f"📊 {summary()}")
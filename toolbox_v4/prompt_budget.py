@@ -0,0 +1,106 @@
+import os
+import json
+import toolbox_logger
+
+try:
+    import tiktoken
+    try:
+        _ENCODING = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        _ENCODING = None # Encoding files unavailable (offline)
+except ImportError:
+    _ENCODING = None
+
+# --- CONFIGURATION ---
+# Token budget per stage prompt (override with PROMPT_BUDGET_STAGE_4=... etc.)
+DEFAULT_BUDGETS = {"stage_4": 6000, "stage_5": 5000, "stage_6": 4000}
+DEFAULT_BUDGET = 8000
+# When the completed-steps history must be cut, keep this many steps from each end
+PLAN_KEEP_EDGES = 8
+
+
+def budget_for(stage):
+    env = os.getenv(f"PROMPT_BUDGET_{stage.upper()}")
+    return int(env) if env else DEFAULT_BUDGETS.get(stage, DEFAULT_BUDGET)
+
+
+def estimate_tokens(text):
+    """Exact count with tiktoken when installed, else ~4 characters per token."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return (len(text) + 3) // 4
+
+
+def tool_signature(tool):
+    """A tool without its body: what the model needs to call it."""
+    sig = {k: tool[k] for k in ("name", "description", "parameters") if k in tool}
+    body = tool.get("body")
+    if isinstance(body, list):
+        sig["steps"] = len(body)
+    return sig
+
+
+def dedup_steps(steps):
+    """Collapses runs of identical consecutive steps into one step with "repeat": n."""
+    if not isinstance(steps, list):
+        return steps
+    out = []
+    for step in steps:
+        if out and isinstance(step, dict) and out[-1][0] == step:
+            out[-1][1] += 1
+        else:
+            out.append([step, 1])
+    return [dict(s, repeat=n) if n > 1 and isinstance(s, dict) else s for s, n in out]
+
+
+def trim_plan(steps, keep=PLAN_KEEP_EDGES):
+    """Keeps the first and last `keep` steps and notes how many were cut."""
+    if not isinstance(steps, list) or len(steps) <= 2 * keep + 1:
+        return steps
+    return steps[:keep] + [{"omitted_steps": len(steps) - 2 * keep}] + steps[-keep:]
+
+
+def fit(stage, render, tools=None, plan=None, steps=None):
+    """
+    Builds a stage prompt within its token budget.
+    `render(tools=..., plan=..., steps=...)` receives JSON strings and returns the prompt.
+    Compaction ladder, stopping as soon as the prompt fits:
+      0. repeated consecutive steps collapsed (always)
+      1. tool bodies replaced by signatures
+      2. long completed-step histories (`steps`) trimmed to their first and last steps
+    `plan` is never trimmed: the model rewrites it and can't reproduce steps it never saw.
+    Logs the final size per stage.
+    """
+    budget = budget_for(stage)
+    parts = {
+        "tools": tools,
+        "plan": dedup_steps(plan),
+        "steps": dedup_steps(steps),
+    }
+    ladder = [
+        ("full", lambda p: p),
+        ("tools→signatures", lambda p: dict(p, tools=[tool_signature(t) for t in p["tools"] or [] if isinstance(t, dict)])),
+        ("history trimmed", lambda p: dict(p, steps=trim_plan(p["steps"]))),
+    ]
+
+    raw_tokens = None
+    applied = []
+    for name, compact in ladder:
+        parts = compact(parts)
+        if name != "full":
+            applied.append(name)
+        prompt = render(**{k: json.dumps(v) for k, v in parts.items()})
+        tokens = estimate_tokens(prompt)
+        if raw_tokens is None:
+            raw_tokens = tokens
+        if tokens <= budget:
+            break
+
+    over = " ⚠️ OVER BUDGET" if tokens > budget else ""
+    toolbox_logger.log_action("PROMPT_SIZE", {
+        "stage": stage, "tokens": tokens, "uncompacted": raw_tokens,
+        "budget": budget, "compaction": applied or ["none"]
+    })
+    if over:
+        print(f"   📏 [{stage}] {tokens} tokens{over} (budget {budget})")
+    return prompt
@@ -3,7 +3,10 @@ import time
 import subprocess
 import sys
 import threading
+import atexit
 from dotenv import load_dotenv
+import log_shipper
+import command_feed
 
 # --- CONFIGURATION ---
 # Try loading from current dir, then parent dir
@@ -52,6 +55,10 @@ except ImportError:
 # Initialize Sync Client
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Background batching of log lines (never blocks the agent's stdout pipe)
+shipper = log_shipper.LogShipper(supabase, "agent_logs")
+atexit.register(shipper.close)
+
 AGENT_ID = None
 
 def get_agent_id():
@@ -76,31 +83,28 @@ def get_agent_id():
 
 def push_log_to_cloud(message):
     """
-    Sends a log line to Supabase for the web UI to see.
+    Queues a log line for Supabase so the web UI can see it.
+    Returns immediately; the shipper thread batches the actual inserts.
     """
-    try:
-        if not message.strip(): return
-        
-        payload = {
-            "log_message": message.strip(),
-            "timestamp": time.time()
-        }
-        # Attempt to tag with user_email if AGENT_ID is set
-        if AGENT_ID:
-            payload["user_email"] = AGENT_ID
-
-        supabase.table("agent_logs").insert(payload).execute()
-    except Exception as e:
-        # If user_email column is missing in logs table, this might fail. 
-        # But we catch it silently to keep the agent running.
-        pass 
+    if not message.strip(): return
+    
+    payload = {
+        "log_message": message.strip(),
+        "timestamp": time.time()
+    }
+    # Attempt to tag with user_email if AGENT_ID is set
+    if AGENT_ID:
+        payload["user_email"] = AGENT_ID
+
+    shipper.enqueue(payload)
 
 def stream_process_output(process):
     """
     Reads stdout/stderr from the agent process and pushes CLEAN logs to cloud.
     """
     # User-friendly prefixes we want to show
-    KEEP_PREFIXES = ("👉", "🧠", "🚀", "✅", "❌", "⚠️", "⌨️", "🖱️", "🌐", "👀", "⏳")
+    # 📊 carries the agent's end-of-task stats (Groq calls, plan extraction)
+    KEEP_PREFIXES = ("👉", "🧠", "🚀", "✅", "❌", "⚠️", "⌨️", "🖱️", "🌐", "👀", "⏳", "📊")
     
     # Use iter(callable, sentinel) to read line by line until empty byte string
     for line in iter(process.stdout.readline, b''):
@@ -154,56 +158,40 @@ def launch_agent():
         print(err_msg)
         push_log_to_cloud(err_msg)
 
-def poll_for_commands():
+def handle_command(cmd):
+    cmd_text = cmd.get("command")
+    print(f"📩 RECEIVED COMMAND: {cmd_text}")
+
+    if cmd_text == "START":
+        launch_agent()
+
+def listen_for_commands():
     # 1. Get Identity
     get_agent_id()
 
-    print(f"--- 🌉 TOOLBOX REMOTE BRIDGE (Polling: {AGENT_ID}) ---")
+    print(f"--- 🌉 TOOLBOX REMOTE BRIDGE ({command_feed.COMMAND_FEED_MODE}: {AGENT_ID}) ---")
     print("Waiting for web commands...")
-    
-    last_checked_id = 0
-    
+
+    # Realtime push when available, adaptive polling otherwise
+    feed = command_feed.CommandFeed(supabase, AGENT_ID, url=SUPABASE_URL, key=SUPABASE_KEY)
+
     # Get the latest ID to avoid re-running old commands
     try:
-        # Filter by user_email
-        query = supabase.table("agent_commands").select("id").eq("user_email", AGENT_ID).order("id", desc=True).limit(1)
-        latest = query.execute()
-        if latest.data:
-            last_checked_id = latest.data[0]['id']
-            print(f"   (Ignoring commands prior to ID {last_checked_id})")
+        if feed.fetch_latest_id():
+            print(f"   (Ignoring commands prior to ID {feed.last_id})")
     except Exception as e:
         print(f"⚠️ Could not fetch initial state: {e}")
 
-    while True:
-        try:
-            # Poll for new commands FOR THIS USER
-            response = supabase.table("agent_commands")\
-                .select("*")\
-                .eq("user_email", AGENT_ID)\
-                .gt("id", last_checked_id)\
-                .order("id", desc=False)\
-                .execute()
-            
-            commands = response.data
-            
-            for cmd in commands:
-                cmd_text = cmd.get("command")
-                print(f"📩 RECEIVED COMMAND: {cmd_text}")
-                
-                if cmd_text == "START":
-                    launch_agent()
-                
-                # Update last checked ID
-                last_checked_id = cmd['id']
-            
-            time.sleep(1) # Poll every 1s
-            
-        except Exception as e:
-            print(f"⚠️ Polling Error: {e}")
-            time.sleep(2)
+    try:
+        feed.run(handle_command)
+    finally:
+        feed.stop()
+        print(f"📊 Commands: {feed.summary()}")
 
 if __name__ == "__main__":
     try:
-        poll_for_commands()
+        listen_for_commands()
     except KeyboardInterrupt:
         print("\n🛑 Stopped by User.")
+        shipper.close()
+        print(f"📊 Cloud logs: {shipper.summary()}")
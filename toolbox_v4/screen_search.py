@@ -1,29 +1,157 @@
-import ApplicationServices
-import Cocoa
-import pyautogui
 import time
 import re
 import os
+import sys
+import heapq
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import focus_tracker
+
+try:
+    import ApplicationServices
+    import Cocoa
+    AX_AVAILABLE = True
+except ImportError:
+    AX_AVAILABLE = False
+
+try:
+    import gi
+    gi.require_version("Atspi", "2.0")
+    from gi.repository import Atspi
+    ATSPI_AVAILABLE = True
+except (ImportError, ValueError):
+    ATSPI_AVAILABLE = False
+
+# --- CONFIGURATION ---
+# How long a flattened AX snapshot is reused before a rebuild (seconds)
+SNAPSHOT_TTL = float(os.getenv("AX_SNAPSHOT_TTL", "3.0"))
+# Web elements are often nested 8-12 levels deep
+MAX_DEPTH = 15
+# Per-lookup search budget (nodes expanded across all apps / seconds)
+AX_NODE_BUDGET = int(os.getenv("AX_NODE_BUDGET", "4000"))
+AX_TIME_BUDGET = float(os.getenv("AX_TIME_BUDGET", "1.5"))
+# Apps scanned concurrently (AX IPC blocks but releases the GIL)
+AX_SCAN_WORKERS = int(os.getenv("AX_SCAN_WORKERS", "4"))
+# Text containers only match on their value (not their label)
+TEXT_ROLES = ['AXTextArea', 'AXStaticText', 'AXTextField']
+# Match ranking: clickable roles first (lower is better, default 2)
+ROLE_PRIORITY = {
+    "AXButton": 0, "AXLink": 0,
+    "AXMenuItem": 1, "AXMenuBarItem": 1, "AXMenuButton": 1, "AXPopUpButton": 1,
+    "AXRadioButton": 1, "AXCheckBox": 1, "AXTab": 1, "AXCell": 1, "AXRow": 1,
+    "AXStaticText": 3, "AXTextArea": 3,
+}
+# Search order: extra depth charged before descending into big subtrees
+DESCEND_PENALTY = {
+    "AXToolbar": -1, "AXTabGroup": -1,
+    "AXWebArea": 3, "AXTable": 2, "AXOutline": 2, "AXBrowser": 2,
+    "AXScrollArea": 1, "AXList": 1,
+}
+
+# --- TREE PROVIDERS ---
+
+_ipc_lock = threading.Lock() # Providers are read from several scan workers at once
+
+class TreeProvider(ABC):
+    """
+    Backend-neutral element finder interface. The snapshot/search logic only
+    talks to this; roles are reported using macOS AX role names so ranking
+    and pruning rules are shared across platforms.
+    """
+    ipc_calls = 0
+
+    def _count_ipc(self):
+        with _ipc_lock:
+            self.ipc_calls += 1
+
+    @abstractmethod
+    def list_apps(self):
+        """Returns [(app_name, root_element)] in scan priority order."""
+
+    @abstractmethod
+    def read_node(self, element):
+        """Returns (title, description, value, role, children, frame)."""
+
+    @abstractmethod
+    def frame(self, element):
+        """Returns (x, y, w, h) or None if the element has no geometry (or is gone)."""
+
+    def screen_size(self):
+        import pyautogui
+        return tuple(pyautogui.size())
+
+
+class MacAXTreeProvider(TreeProvider):
+    """
+    Reads the live macOS accessibility tree via ApplicationServices.
+    Attributes are fetched in one batched IPC call per node; `ipc_calls`
+    counts every round-trip to the target app.
+    """
+    NODE_ATTRIBUTES = ["AXTitle", "AXDescription", "AXValue", "AXRole", "AXChildren", "AXPosition", "AXSize"]
+    GEOMETRY_ATTRIBUTES = ["AXPosition", "AXSize"]
 
-class ScreenScanner:
     def __init__(self):
-        # Initialize the system-wide UI element
-        self.system_wide = ApplicationServices.AXUIElementCreateSystemWide()
-        
+        self.ipc_calls = 0
+
+    def list_apps(self):
+        """Returns [(app_name, root_element)] in scan priority order."""
+        workspace = Cocoa.NSWorkspace.sharedWorkspace()
+        running_apps = workspace.runningApplications()
+        my_pid = os.getpid()
+        parent_pid = os.getppid() # The Terminal
+
+        # Sort apps: Active first, then Dock/Finder, then others
+        def app_priority(a):
+            if a.isActive(): return 0
+            bid = a.bundleIdentifier()
+            if bid and "dock" in bid.lower(): return 1
+            return 2
+
+        apps = []
+        for app in sorted(running_apps, key=app_priority):
+            pid = app.processIdentifier()
+            if pid == my_pid or pid == parent_pid:
+                continue
+            # Skip background daemons (no UI) to speed up
+            if app.activationPolicy() == Cocoa.NSApplicationActivationPolicyProhibited:
+                continue
+            apps.append((str(app.localizedName()), ApplicationServices.AXUIElementCreateApplication(pid)))
+        return apps
+
     def _get_attribute(self, element, attribute):
         """Helper to safely get an attribute value from an AXUIElement."""
+        self._count_ipc()
         error, value = ApplicationServices.AXUIElementCopyAttributeValue(element, attribute, None)
         if error == 0:
             return value
         return None
 
+    def _get_attributes(self, element, attributes):
+        """Fetches several attributes in ONE IPC call. Missing ones come back as None."""
+        self._count_ipc()
+        error, values = ApplicationServices.AXUIElementCopyMultipleAttributeValues(element, attributes, 0, None)
+        if error != 0 or values is None:
+            return [None] * len(attributes)
+        return [self._clean(v) for v in values]
+
+    def _clean(self, value):
+        """Per-attribute failures are returned as AXValueRefs of the AXError type."""
+        if type(value).__name__ == "AXValueRef":
+            try:
+                if ApplicationServices.AXValueGetType(value) == ApplicationServices.kAXValueAXErrorType:
+                    return None
+            except Exception:
+                pass
+        return value
+
     def _unpack_pos(self, ax_value):
         """Robustly extracts (x, y) from AXValueRef."""
         try:
             return (ax_value.x, ax_value.y)
         except:
             pass
-        
+
         text = str(ax_value)
         match = re.search(r"x:([\d\.]+)\s+y:([\d\.]+)", text)
         if match:
@@ -36,132 +164,522 @@ class ScreenScanner:
             return (ax_value.width, ax_value.height)
         except:
             pass
-            
+
         text = str(ax_value)
         match = re.search(r"w:([\d\.]+)\s+h:([\d\.]+)", text)
         if match:
             return (float(match.group(1)), float(match.group(2)))
         return (0, 0)
 
-    def scan_recursive(self, element, target_name, depth=0, max_depth=10):
-        """Recursively searches the accessibility tree for an element matching target_name."""
-        if depth > max_depth:
+    def read_node(self, element):
+        """
+        Returns (title, description, value, role, children, frame) for one element.
+        Geometry rides along in the same batched call so subtrees can be pruned.
+        """
+        title, desc, value, role, children, pos_val, size_val = self._get_attributes(element, self.NODE_ATTRIBUTES)
+        return (title, desc, value, role, children or [], self._to_frame(pos_val, size_val))
+
+    def frame(self, element):
+        """Returns (x, y, w, h) or None if the element has no geometry (or is gone)."""
+        pos_val, size_val = self._get_attributes(element, self.GEOMETRY_ATTRIBUTES)
+        return self._to_frame(pos_val, size_val)
+
+    def _to_frame(self, pos_val, size_val):
+        if not (pos_val and size_val):
             return None
+        return self._unpack_pos(pos_val) + self._unpack_size(size_val)
+
+
+class AtspiTreeProvider(TreeProvider):
+    """
+    Reads the Linux desktop accessibility tree over AT-SPI (D-Bus).
+    Works on GNOME/KDE sessions and under Xvfb with at-spi2-core running.
+    Each libatspi getter is one D-Bus round-trip unless the app supports
+    AT-SPI caching; `ipc_calls` counts them.
+    """
+    # AT-SPI role name -> AX role name used by the shared ranking tables
+    ROLE_MAP = {
+        "push button": "AXButton", "toggle button": "AXButton", "link": "AXLink",
+        "menu item": "AXMenuItem", "check menu item": "AXMenuItem", "radio menu item": "AXMenuItem",
+        "menu": "AXMenuButton", "combo box": "AXPopUpButton",
+        "radio button": "AXRadioButton", "check box": "AXCheckBox", "page tab": "AXTab",
+        "table cell": "AXCell", "table row": "AXRow", "list item": "AXCell",
+        "label": "AXStaticText", "static": "AXStaticText", "text": "AXTextArea",
+        "entry": "AXTextField", "password text": "AXTextField",
+        "tool bar": "AXToolbar", "page tab list": "AXTabGroup",
+        "document web": "AXWebArea", "document frame": "AXWebArea",
+        "table": "AXTable", "tree table": "AXOutline", "tree": "AXOutline",
+        "scroll pane": "AXScrollArea", "list": "AXList",
+        "frame": "AXWindow", "window": "AXWindow", "dialog": "AXWindow",
+        "application": "AXApplication",
+    }
+    TEXT_INPUT_ROLES = ("text", "entry", "password text")
+    # Labels keep their text in the name; AXStaticText keeps it in the value, which the matcher checks
+    LABEL_ROLES = ("label", "static")
+
+    def __init__(self):
+        self.ipc_calls = 0
+
+    def _call(self, fn, *args):
+        self._count_ipc()
+        try:
+            return fn(*args)
+        except Exception:
+            return None
+
+    def list_apps(self):
+        desktop = Atspi.get_desktop(0)
+        skip = {os.getpid(), os.getppid()} # The HUD and the Terminal
+        apps = []
+        for i in range(self._call(desktop.get_child_count) or 0):
+            app = self._call(desktop.get_child_at_index, i)
+            if app is None or self._call(app.get_process_id) in skip:
+                continue
+            # Active window's app first, like NSWorkspace.isActive on macOS
+            priority = 0 if self._is_active(app) else 1
+            apps.append((priority, i, self._call(app.get_name) or "Unknown", app))
+        apps.sort(key=lambda a: (a[0], a[1]))
+        return [(name, app) for _, _, name, app in apps]
+
+    def _is_active(self, app):
+        for i in range(self._call(app.get_child_count) or 0):
+            window = self._call(app.get_child_at_index, i)
+            states = window and self._call(window.get_state_set)
+            if states and states.contains(Atspi.StateType.ACTIVE):
+                return True
+        return False
 
-        # 1. Check current element's properties
-        title = self._get_attribute(element, "AXTitle")
-        desc = self._get_attribute(element, "AXDescription")
-        value = self._get_attribute(element, "AXValue")
-        role = self._get_attribute(element, "AXRole")
-
-        # Skip generic containers if they have no useful info
-        # But we must dive into them.
-        
-        # Check match
-        search_terms = [str(title), str(desc), str(value)]
-        if any(target_name.lower() in term.lower() for term in search_terms if term != "None"):
-            
-            # FILTER: Ignore text areas
-            if role in ['AXTextArea', 'AXStaticText', 'AXTextField'] and target_name.lower() not in str(value).lower():
-                pass 
-            else:
-                pos_val = self._get_attribute(element, "AXPosition")
-                size_val = self._get_attribute(element, "AXSize")
-                
-                if pos_val and size_val:
-                    x, y = self._unpack_pos(pos_val)
-                    w, h = self._unpack_size(size_val)
-                    
-                    # VALIDATION: Ignore ghost elements at (0,0) or (0, height) or size 0
-                    screen_w, screen_h = pyautogui.size()
-                    if (x == 0 and (y == 0 or y >= screen_h - 50)) or (w <= 1 or h <= 1):
-                        # print(f"Skipping ghost/hidden element at ({x}, {y})")
-                        pass
-                    else:
-                        return {"element": element, "position": pos_val, "size": size_val, "role": role}
-
-        # 2. Search Children
-        error, children = ApplicationServices.AXUIElementCopyAttributeValue(element, "AXChildren", None)
-        if error == 0 and children:
-            for child in children:
-                result = self.scan_recursive(child, target_name, depth + 1, max_depth)
-                if result:
-                    return result
-        
+    def _value(self, acc, role_name, title):
+        if role_name in self.TEXT_INPUT_ROLES:
+            count = self._call(Atspi.Text.get_character_count, acc)
+            if count:
+                return self._call(Atspi.Text.get_text, acc, 0, count)
+        elif role_name in self.LABEL_ROLES:
+            return title
         return None
 
+    def read_node(self, acc):
+        role_name = self._call(acc.get_role_name) or ""
+        title = self._call(acc.get_name) or None
+        desc = self._call(acc.get_description) or None
+        value = self._value(acc, role_name, title)
+        count = self._call(acc.get_child_count) or 0
+        children = [c for c in (self._call(acc.get_child_at_index, i) for i in range(count)) if c is not None]
+        # Hidden widgets report stale extents: present them as zero-size so they get pruned
+        states = self._call(acc.get_state_set)
+        if states is not None and role_name != "application" and not states.contains(Atspi.StateType.SHOWING):
+            frame = (0, 0, 0, 0)
+        else:
+            frame = self.frame(acc)
+        return (title, desc, value, self.ROLE_MAP.get(role_name, role_name), children, frame)
+
+    def frame(self, acc):
+        rect = self._call(acc.get_extents, Atspi.CoordType.SCREEN)
+        if rect is None or (rect.width < 0 and rect.height < 0):
+            return None
+        return (rect.x, rect.y, rect.width, rect.height)
+
+
+class FakeTreeProvider(TreeProvider):
+    """
+    In-memory tree for Linux/CI.
+    apps: [(app_name, node)] where node = {"title", "description", "value", "role",
+    "frame": (x, y, w, h), "children": [...]}.
+    """
+    def __init__(self, apps, screen_size=(1440, 900)):
+        self.apps = apps
+        self.size = screen_size
+        self.ipc_calls = 0
+
+    def list_apps(self):
+        return list(self.apps)
+
+    def read_node(self, node):
+        self._count_ipc()
+        return (node.get("title"), node.get("description"), node.get("value"), node.get("role"), node.get("children", []), node.get("frame"))
+
+    def frame(self, node):
+        self._count_ipc()
+        return node.get("frame")
+
+    def screen_size(self):
+        return self.size
+
+
+def backend_available():
+    """True if default_provider() has an accessibility backend on this platform."""
+    return (sys.platform == "darwin" and AX_AVAILABLE) or (sys.platform.startswith("linux") and ATSPI_AVAILABLE)
+
+
+def default_provider():
+    if sys.platform == "darwin" and AX_AVAILABLE:
+        return MacAXTreeProvider()
+    if sys.platform.startswith("linux") and ATSPI_AVAILABLE:
+        return AtspiTreeProvider()
+    raise RuntimeError("No accessibility backend available on this platform.")
+
+# --- SNAPSHOT ---
+
+class AXSnapshot:
+    """
+    Flattened accessibility tree: parallel arrays indexed by node id
+    (in visit order), plus a lowercase label -> [node ids] index.
+    The tree is expanded lazily, best-first; `frontiers` holds one heap
+    per app of subtrees not visited yet so later lookups can resume the
+    search. Apps are expanded from separate threads, so writes go through `lock`.
+    """
+    def __init__(self, focus_generation, screen_size):
+        self.focus_generation = focus_generation
+        self.screen_size = screen_size
+        self.created_at = time.time()
+        self.labels = []
+        self.values = []
+        self.roles = []
+        self.frames = []
+        self.apps = []
+        self.app_ranks = []
+        self.depths = []
+        self.elements = []
+        self.index = {}
+        self.frontiers = {}
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.visited = 0
+        self.pruned = 0
+        self.ipc_calls = 0
+
+    def __len__(self):
+        return len(self.roles)
+
+    def age(self):
+        return time.time() - self.created_at
+
+    def exhausted(self):
+        return not any(self.frontiers.values())
+
+    def queued(self):
+        return sum(len(f) for f in self.frontiers.values())
+
+    def push(self, app_rank, app_name, element, depth, cost):
+        """Queues a subtree on its app's frontier. Lower cost is visited first."""
+        with self.lock:
+            self.seq += 1
+            heapq.heappush(self.frontiers.setdefault(app_rank, []), (cost, self.seq, app_name, element, depth))
+
+    def pop(self, app_rank):
+        with self.lock:
+            frontier = self.frontiers.get(app_rank)
+            return heapq.heappop(frontier) if frontier else None
+
+    def add(self, app_name, app_rank, depth, element, texts, value, role, frame=None):
+        with self.lock:
+            node_id = len(self.roles)
+            self.labels.append(" | ".join(texts))
+            self.values.append(value)
+            self.roles.append(role)
+            self.frames.append(frame)
+            self.apps.append(app_name)
+            self.app_ranks.append(app_rank)
+            self.depths.append(depth)
+            self.elements.append(element)
+            for text in texts:
+                self.index.setdefault(text, []).append(node_id)
+            return node_id
+
+    def lookup(self, target):
+        """Returns node ids whose label contains target (exact labels included)."""
+        target = target.lower()
+        with self.lock:
+            exact = list(self.index.get(target, []))
+            partial = []
+            for label, ids in self.index.items():
+                if label != target and target in label:
+                    partial.extend(ids)
+
+        seen = set()
+        matches = []
+        for node_id in exact + partial:
+            if node_id in seen:
+                continue
+            seen.add(node_id)
+            # FILTER: Ignore text areas unless the match is in their value
+            if self.roles[node_id] in TEXT_ROLES and target not in self.values[node_id]:
+                continue
+            matches.append(node_id)
+        return matches
+
+    def score(self, node_id, target):
+        """Ranking key (lower is better): exact label, clickable role, app priority, shallow."""
+        target = target.lower()
+        exact = 0 if node_id in self.index.get(target, ()) else 1
+        role_rank = ROLE_PRIORITY.get(self.roles[node_id], 2)
+        return (exact, role_rank, self.app_ranks[node_id], self.depths[node_id], node_id)
+
+    def is_strong(self, node_id, target):
+        """An exact-label button/link: good enough to stop searching."""
+        return self.score(node_id, target)[:2] == (0, 0)
+
+    def result(self, node_id):
+        return {
+            "element": self.elements[node_id],
+            "frame": self.frames[node_id],
+            "role": self.roles[node_id],
+            "app": self.apps[node_id],
+            "label": self.labels[node_id],
+        }
+
+# --- SCANNER ---
+
+class ScreenScanner:
+    """
+    Finds on-screen elements by label using a cached, flattened AX snapshot.
+    The snapshot is searched best-first within a node/time budget (apps in
+    parallel) and reused until focus changes (FocusTracker generation),
+    SNAPSHOT_TTL expires, or a cached hit turns out to be stale.
+    """
+    def __init__(self, provider=None, ttl=SNAPSHOT_TTL, tracker=None,
+                 node_budget=AX_NODE_BUDGET, time_budget=AX_TIME_BUDGET, workers=AX_SCAN_WORKERS):
+        self.provider = provider or default_provider()
+        self.ttl = ttl
+        self.tracker = tracker or focus_tracker.get_tracker()
+        self.node_budget = node_budget
+        self.time_budget = time_budget
+        self.workers = workers
+        self.executor = None # Per-app scan pool, sized from `workers`
+        self.snapshot = None
+        self.lock = threading.RLock()
+        self.builds = 0
+        self.hits = 0
+
+    def invalidate(self):
+        with self.lock:
+            self.snapshot = None
+
+    def _pool(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ax-scan")
+            return self.executor
+
+    def _is_fresh(self, snapshot):
+        if snapshot is None or snapshot.age() > self.ttl:
+            return False
+        self.tracker.get() # Refresh generation
+        return snapshot.focus_generation == self.tracker.generation
+
+    def get_snapshot(self):
+        """Returns (snapshot, from_cache)."""
+        with self.lock:
+            if self._is_fresh(self.snapshot):
+                self.hits += 1
+                return self.snapshot, True
+            self.snapshot = self.build_snapshot()
+            return self.snapshot, False
+
+    def build_snapshot(self):
+        """Starts a new snapshot with every app root on the frontier (nothing visited yet)."""
+        self.tracker.get()
+        snapshot = AXSnapshot(self.tracker.generation, self.provider.screen_size())
+        for app_rank, (app_name, root) in enumerate(self.provider.list_apps()):
+            snapshot.push(app_rank, app_name, root, 0, 0)
+        self.builds += 1
+        return snapshot
+
+    def _is_ghost(self, frame, screen_h):
+        """Ghost elements sit at (0,0) or (0, height), or have no size."""
+        x, y, w, h = frame
+        return (x == 0 and (y == 0 or y >= screen_h - 50)) or (w <= 1 or h <= 1)
+
+    def _is_offscreen(self, frame, screen_size):
+        """Zero-size or fully off-screen: nothing under it can be clicked."""
+        x, y, w, h = frame
+        screen_w, screen_h = screen_size
+        return w <= 0 or h <= 0 or x + w <= 0 or y + h <= 0 or x >= screen_w or y >= screen_h
+
+    def expand(self, snapshot, target=None, node_budget=None, time_budget=None, stop=None):
+        """
+        Expands every app's frontier concurrently (one worker per app) until the
+        node budget or time budget runs out, or (if target is given) a strong
+        match is found. The node budget is shared by all apps (workers draw from one
+        counter), so a lookup costs the same however many apps are open. A strong
+        match in one app cancels the lower-priority apps only, so app priority still breaks ties.
+        `stop` (threading.Event) lets a caller abandon the search early.
+        Returns the number of nodes visited.
+        """
+        node_budget = self.node_budget if node_budget is None else node_budget
+        time_budget = self.time_budget if time_budget is None else time_budget
+        start = time.time()
+        ipc_before = self.provider.ipc_calls
+        deadline = start + time_budget
+        cancel = {"rank": float("inf"), "lock": threading.Lock(), "stop": stop or threading.Event(),
+                  "nodes_left": node_budget}
+
+        app_ranks = sorted(rank for rank, frontier in snapshot.frontiers.items() if frontier)
+        if len(app_ranks) > 1 and self.workers > 1:
+            futures = [self._pool().submit(self._expand_app, snapshot, rank, target, deadline, cancel)
+                       for rank in app_ranks]
+            per_app = [f.result() for f in futures]
+        else:
+            per_app = [self._expand_app(snapshot, rank, target, deadline, cancel)
+                       for rank in app_ranks]
+
+        # Counters are summed here, on the calling thread, not from the workers
+        visited = sum(v for v, _ in per_app)
+        snapshot.pruned += sum(p for _, p in per_app)
+        snapshot.visited += visited
+        snapshot.ipc_calls += self.provider.ipc_calls - ipc_before
+        print(f"   🌳 AX search: +{visited} nodes across {len(app_ranks)} app(s) ({len(snapshot)} indexed, "
+              f"{snapshot.pruned} pruned, {snapshot.queued()} queued), {snapshot.ipc_calls} IPC calls "
+              f"in {(time.time() - start) * 1000:.0f}ms")
+        return visited
+
+    def _take_node(self, cancel):
+        """Draws one node from the lookup's shared budget. False once it is spent."""
+        with cancel["lock"]:
+            if cancel["nodes_left"] <= 0:
+                return False
+            cancel["nodes_left"] -= 1
+            return True
+
+    def _expand_app(self, snapshot, app_rank, target, deadline, cancel):
+        """Best-first walk of one app's frontier. Runs on a pool thread. Returns (visited, pruned)."""
+        visited = 0
+        pruned = 0
+
+        # Stop once a strong match exists in this app or a higher-priority one
+        while app_rank < cancel["rank"] and time.time() < deadline and not cancel["stop"].is_set():
+            if not self._take_node(cancel):
+                break
+            item = snapshot.pop(app_rank)
+            if item is None:
+                with cancel["lock"]:
+                    cancel["nodes_left"] += 1 # This app is fully scanned: leave the node to the others
+                break
+            cost, _, app_name, element, depth = item
+            visited += 1
+
+            # 1. Read the node (one batched call, geometry included)
+            title, desc, value, role, children, frame = self.provider.read_node(element)
+
+            # 2. Prune offscreen / zero-size subtrees before descending
+            if frame and self._is_offscreen(frame, snapshot.screen_size):
+                pruned += 1
+                continue
+
+            texts = [str(t).lower() for t in (title, desc, value) if t is not None and str(t)]
+            if texts:
+                node_id = snapshot.add(app_name, app_rank, depth, element, texts, str(value).lower(), role, frame)
+                # Early exit on an exact-label button/link that is really on screen
+                if target and target.lower() in texts and snapshot.is_strong(node_id, target) \
+                        and frame and not self._is_ghost(frame, snapshot.screen_size[1]):
+                    with cancel["lock"]:
+                        cancel["rank"] = min(cancel["rank"], app_rank)
+
+            # 3. Queue children, charging extra cost for big containers
+            if depth < MAX_DEPTH:
+                child_cost = depth + 1 + DESCEND_PENALTY.get(role, 0)
+                for child in children:
+                    snapshot.push(app_rank, app_name, child, depth + 1, child_cost)
+
+        return visited, pruned
+
+    def _resolve_frames(self, snapshot, node_ids):
+        """Fetches geometry for candidates that lack it and drops ghosts/geometry-less nodes."""
+        valid = []
+        for node_id in node_ids:
+            if snapshot.frames[node_id] is None:
+                snapshot.frames[node_id] = self.provider.frame(snapshot.elements[node_id]) or ()
+            frame = snapshot.frames[node_id]
+            if frame and not self._is_ghost(frame, snapshot.screen_size[1]):
+                valid.append(node_id)
+        return valid
+
+    def _ranked(self, snapshot, name):
+        matches = self._resolve_frames(snapshot, snapshot.lookup(name))
+        return sorted(matches, key=lambda m: snapshot.score(m, name))
+
+    def find_all(self, name, stop=None):
+        """
+        Returns every match for name, best first, as
+        [{"element", "frame", "role", "app", "label"}].
+        Setting `stop` (threading.Event) cuts any running search short.
+        """
+        with self.lock:
+            snapshot, cached = self.get_snapshot()
+            ranked = self._ranked(snapshot, name)
+
+            # Resume the search unless we already hold a strong match
+            if not (ranked and snapshot.is_strong(ranked[0], name)) and not snapshot.exhausted():
+                self.expand(snapshot, target=name, stop=stop)
+                ranked = self._ranked(snapshot, name)
+
+            # Cached elements may have moved or vanished: re-check the leader's live geometry
+            while cached and ranked and self.provider.frame(snapshot.elements[ranked[0]]) != snapshot.frames[ranked[0]]:
+                ranked.pop(0)
+
+            if cached and not ranked and not (stop and stop.is_set()):
+                self.snapshot = snapshot = self.build_snapshot()
+                self.expand(snapshot, target=name, stop=stop)
+                ranked = self._ranked(snapshot, name)
+
+            return [snapshot.result(m) for m in ranked]
+
+    def find(self, name, stop=None):
+        """Returns the best match for name as {"element", "frame", "role", "app", "label"} or None."""
+        matches = self.find_all(name, stop=stop)
+        return matches[0] if matches else None
+
     def find_and_click(self, name):
         """Finds an element by name and clicks its center."""
         print(f"Searching for: '{name}'...")
-        
-        workspace = Cocoa.NSWorkspace.sharedWorkspace()
-        running_apps = workspace.runningApplications()
-        my_pid = os.getpid()
-        parent_pid = os.getppid() # The Terminal
-        
-        # Sort apps: Active first, then Dock/Finder, then others
-        def app_priority(a):
-            if a.isActive(): return 0
-            bid = a.bundleIdentifier()
-            if bid and "dock" in bid.lower(): return 1
-            return 2
-            
-        running_apps = sorted(running_apps, key=app_priority)
 
-        for app in running_apps:
-            pid = app.processIdentifier()
-            if pid == my_pid or pid == parent_pid:
-                continue
-                
-            # Skip background daemons (no UI) to speed up
-            if app.activationPolicy() == Cocoa.NSApplicationActivationPolicyProhibited:
-                continue
-                
-            # print(f"Scanning app: {app.localizedName()}...")
-            app_element = ApplicationServices.AXUIElementCreateApplication(pid)
-            
-            # INCREASE DEPTH for Browser internal elements
-            # Web elements are often nested 8-12 levels deep
-            result = self.scan_recursive(app_element, name, max_depth=15)
-            
-            if result:
-                self._click_result(result, name)
-                return True
-        
+        result = self.find(name)
+        if result:
+            return self._click_result(result, name)
+
         print(f"Error: Could not find '{name}' on screen.")
         return False
 
     def _click_result(self, result, name):
-        pos_raw = result["position"]
-        size_raw = result["size"]
-        
-        x, y = self._unpack_pos(pos_raw)
-        w, h = self._unpack_size(size_raw)
-        
+        import pyautogui
+        x, y, w, h = result["frame"]
+
         center_x = x + (w / 2)
         center_y = y + (h / 2)
-        
-        screen_w, screen_h = pyautogui.size()
+
+        screen_w, screen_h = self.provider.screen_size()
         print(f"DEBUG: Found {result.get('role')} at ({center_x}, {center_y})")
-        
+
         if center_y > screen_h or center_x > screen_w:
              print("WARNING: Off-screen match ignored.")
-             return
+             return False
 
         print(f"Clicking '{name}'...")
         pyautogui.moveTo(center_x, center_y, duration=0.5)
         pyautogui.click()
+        return True
+
+
+_scanner = None
+_scanner_lock = threading.Lock()
+
+def get_scanner():
+    """Process-wide scanner so the snapshot is shared across click_text steps."""
+    global _scanner
+    with _scanner_lock:
+        if _scanner is None:
+            _scanner = ScreenScanner()
+        return _scanner
 
 if __name__ == "__main__":
-    import os 
     scanner = ScreenScanner()
     # Test
-    target = "Visual Studio Code" 
-    
+    target = "Visual Studio Code"
+
     print(f"--- READY ---")
     print(f"You have 5 seconds to switch to the window you want to test...")
     for i in range(5, 0, -1):
         print(f"{i}...")
         time.sleep(1)
-        
+
     scanner.find_and_click(target)
@@ -13,16 +13,19 @@ def find_all_text_matches(target_text, screenshot=None):
         screenshot = pyautogui.screenshot()
     
     print(f"   👁️ Scanning for all instances of '{target_text}'...")
-    data = pytesseract.image_to_data(screenshot, output_type=pytesseract.Output.DICT)
+    screen_w, _ = pyautogui.size()
+    scale = screenshot.width / screen_w
+    exclusion_rects = window_utils.get_exclusion_rects()
+
+    # Paint over the HUD/Terminal so OCR never reads them
+    ocr_image = window_utils.mask_exclusions(screenshot, exclusion_rects, scale)
+    data = pytesseract.image_to_data(ocr_image, output_type=pytesseract.Output.DICT)
     
     # DEBUG: Print everything OCR sees to the terminal
     raw_ocr_words = [w.strip() for w in data['text'] if w.strip()]
     print(f"   📝 [DEBUG OCR]: {' '.join(raw_ocr_words[:100])}...") # Print first 100 words
     
     matches = []
-    screen_w, _ = pyautogui.size()
-    scale = screenshot.width / screen_w
-    exclusion_rects = window_utils.get_exclusion_rects()
 
     target_words = target_text.lower().split()
     n_boxes = len(data['text'])
@@ -61,16 +64,11 @@ def find_all_text_matches(target_text, screenshot=None):
             count += 1
             
         if match_found and count > 0:
-            avg_x = total_x / count
-            avg_y = total_y / count
-            
-            # Filter exclusions
-            if window_utils.is_point_in_rects(avg_x, avg_y, exclusion_rects):
-                continue
-            
-            matches.append((avg_x, avg_y))
-            
-    return matches
+            matches.append((total_x / count, total_y / count))
+
+    # Filter exclusions (all candidates at once)
+    keep = window_utils.points_outside_rects(matches, exclusion_rects)
+    return [m for m, k in zip(matches, keep) if k]
 
 def click_near(target, anchor):
     """
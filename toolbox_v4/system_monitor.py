@@ -1,47 +1,132 @@
 import subprocess
 import sys
 import os
+import time
+import threading
+from contextlib import contextmanager
+import focus_tracker
+
+# One osascript round-trip for everything the prompts need
+SNAPSHOT_SCRIPT = '''
+tell application "System Events"
+    set frontProc to first process whose frontmost is true
+    set appName to name of frontProc
+    set winTitle to ""
+    set winBounds to ""
+    try
+        set w to first window of frontProc
+        set winTitle to name of w
+        set {wx, wy} to position of w
+        set {ww, wh} to size of w
+        set winBounds to (wx as text) & "," & (wy as text) & "," & (ww as text) & "," & (wh as text)
+    end try
+    set appNames to name of every process whose background only is false
+end tell
+set AppleScript's text item delimiters to tab
+set appList to appNames as text
+return appName & linefeed & winTitle & linefeed & winBounds & linefeed & appList
+'''
+
+# Per-thread memo so concurrent compiles don't share snapshots
+_scope = threading.local()
 
 def get_active_window_info():
     """
     Returns a dictionary containing the frontmost app name and window title.
     Supports macOS (darwin) and Windows (win32).
+    Served from the shared FocusTracker cache (no osascript per call).
     """
-    info = {"app": "Unknown", "title": "Unknown"}
-    
+    return focus_tracker.get_tracker().get()
+
+def _probe_snapshot():
+    """Gathers app, title, window bounds and running apps in a single call."""
+    snap = {"app": "Unknown", "title": "Unknown", "bounds": None, "running_apps": []}
+
     if sys.platform == "darwin":
         try:
-            # Get frontmost app name
-            app_script = 'tell application "System Events" to get name of first process whose frontmost is true'
-            app_name = subprocess.check_output(['osascript', '-e', app_script]).decode().strip()
-            
-            # Get window title
-            title_script = 'tell application "System Events" to get name of first window of (first process whose frontmost is true)'
-            window_title = subprocess.check_output(['osascript', '-e', title_script]).decode().strip()
-            
-            info["app"] = app_name
-            info["title"] = window_title
+            out = subprocess.check_output(['osascript', '-e', SNAPSHOT_SCRIPT]).decode()
+            lines = (out.rstrip("\n").split("\n") + ["", "", "", ""])[:4]
+            snap["app"] = lines[0].strip() or "Unknown"
+            snap["title"] = lines[1].strip() or "Unknown"
+            if lines[2].strip():
+                snap["bounds"] = tuple(int(float(v)) for v in lines[2].split(","))
+            snap["running_apps"] = [a for a in lines[3].split("\t") if a.strip()]
         except Exception:
             pass # Fallback to Unknown
-            
+
     elif sys.platform == "win32":
         try:
             import pygetwindow as gw
             window = gw.getActiveWindow()
             if window:
-                info["title"] = window.title
-                # On Windows, process name is harder, but title often contains app name
-                info["app"] = window.title.split(" - ")[-1]
+                snap["title"] = window.title
+                snap["app"] = window.title.split(" - ")[-1]
+                snap["bounds"] = (window.left, window.top, window.width, window.height)
+            snap["running_apps"] = sorted({t.split(" - ")[-1] for t in gw.getAllTitles() if t.strip()})
         except ImportError:
             print("⚠️ pygetwindow not installed. Windows support limited.")
-            
-    return info
+
+    else:
+        info = get_active_window_info()
+        snap["app"], snap["title"] = info["app"], info["title"]
+
+    return snap
+
+def get_system_snapshot():
+    """
+    Returns {"app", "title", "bounds", "running_apps", "probe_ms"}.
+    Inside a compile_scope() the first probe is reused for the rest of the compile.
+    """
+    stats = getattr(_scope, "stats", None)
+    if stats is not None and _scope.snapshot is not None:
+        stats["memo_hits"] += 1
+        return _scope.snapshot
+
+    start = time.perf_counter()
+    snap = _probe_snapshot()
+    snap["probe_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    # Seed the focus cache with what we just learned
+    focus_tracker.get_tracker().prime(snap["app"], snap["title"])
+
+    if stats is not None:
+        stats["probes"] += 1
+        stats["probe_ms"] += snap["probe_ms"]
+        _scope.snapshot = snap
+    return snap
+
+@contextmanager
+def compile_scope():
+    """
+    Memoizes the system snapshot for the duration of one compile (stages 1-5).
+    Yields the stats dict: {"probes", "probe_ms", "memo_hits"}.
+    """
+    _scope.snapshot = None
+    _scope.stats = {"probes": 0, "probe_ms": 0.0, "memo_hits": 0}
+    stats = _scope.stats
+    try:
+        yield stats
+    finally:
+        print(f"   ⏱️  System probing: {stats['probes']} probe(s), {stats['probe_ms']:.0f}ms, {stats['memo_hits']} memo hit(s)")
+        _scope.snapshot = None
+        _scope.stats = None
 
 def get_system_context_string():
     """Formatted string for AI prompts."""
-    ctx = get_active_window_info()
-    return f"CURRENT SYSTEM STATE:\n- Frontmost App: {ctx['app']}\n- Window Title: {ctx['title']}"
+    ctx = get_system_snapshot()
+    lines = [
+        "CURRENT SYSTEM STATE:",
+        f"- Frontmost App: {ctx['app']}",
+        f"- Window Title: {ctx['title']}",
+    ]
+    if ctx["bounds"]:
+        lines.append(f"- Window Bounds (x, y, w, h): {ctx['bounds']}")
+    if ctx["running_apps"]:
+        lines.append(f"- Running Apps: {', '.join(ctx['running_apps'])}")
+    return "\n".join(lines)
 
 if __name__ == "__main__":
     # Test
-    print(get_system_context_string())
+    with compile_scope():
+        print(get_system_context_string())
+        print(get_system_context_string())
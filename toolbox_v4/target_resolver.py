@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import focus_tracker
+import location_cache
+import debounced_save
+
+# --- CONFIGURATION ---
+RESOLVER_MEMORY_FILE = "resolver_memory.json"
+# OCR words below this tesseract confidence don't win a race on their own
+OCR_MIN_CONF = float(os.getenv("OCR_MIN_CONF", "60"))
+# Wins needed before an app skips the race and goes straight to its fast source
+PREFER_AFTER_WINS = int(os.getenv("RESOLVER_PREFER_AFTER", "3"))
+# Win tallies are written at most once per SAVE_DELAY seconds (and at exit)
+SAVE_DELAY = debounced_save.SAVE_DELAY
+
+SOURCES = ("ax", "ocr")
+
+
+def _ax_available():
+    try:
+        import screen_search
+    except Exception:
+        return False
+    return screen_search.backend_available()
+
+
+def _find_ax(text, stop):
+    """Accessibility lookup. Returns (point, confident) or None."""
+    import screen_search
+    result = screen_search.get_scanner().find(text, stop=stop)
+    if not result:
+        return None
+    x, y, w, h = result["frame"]
+    exact = text.lower() in result["label"].split(" | ")
+    confident = exact or screen_search.ROLE_PRIORITY.get(result["role"], 2) <= 1
+    return ((x + w / 2, y + h / 2), confident)
+
+
+def _find_ocr(text, stop):
+    """OCR lookup (tesseract can't be interrupted; `stop` is ignored)."""
+    import visual_search
+    match = visual_search.visual_find(text)
+    if not match:
+        return None
+    return (match["point"], match["conf"] >= OCR_MIN_CONF)
+
+
+class TargetResolver:
+    """
+    Locates click_text targets by racing accessibility and OCR lookups.
+    The first confident hit wins and the other lookup is told to stop.
+    Wins are tallied per app; once one source clearly dominates an app,
+    lookups there go straight to it and only race on a miss.
+    Clicks are served from the LocationCache first when the stored patch
+    still matches the screen. Without an accessibility backend only OCR runs.
+    """
+    def __init__(self, finders=None, tracker=None, memory_file=RESOLVER_MEMORY_FILE, locations=None, save_delay=SAVE_DELAY):
+        if finders is None:
+            finders = {"ocr": _find_ocr}
+            # Checked once: a missing backend would otherwise fail (and log) on every click
+            if _ax_available():
+                finders["ax"] = _find_ax
+            else:
+                print("   ⚠️  No accessibility backend: click_text uses OCR only")
+        self.finders = finders
+        self.sources = tuple(s for s in SOURCES if s in finders)
+        self.tracker = tracker or focus_tracker.get_tracker()
+        self.locations = locations or location_cache.LocationCache()
+        self.memory_file = memory_file
+        self.pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="resolver")
+        self.lock = threading.Lock()
+        self.wins = self._load()
+        self.saver = debounced_save.DebouncedSave(memory_file, lambda: self.wins, self.lock, save_delay)
+
+    def _load(self):
+        if not self.memory_file or not os.path.exists(self.memory_file): return {}
+        try:
+            with open(self.memory_file, 'r') as f: return json.load(f)
+        except: return {}
+
+    def _save(self):
+        """Schedules a write off the click path (call with self.lock held)."""
+        self.saver.schedule()
+
+    def flush(self):
+        """Writes pending tallies now."""
+        self.saver.flush()
+
+    def record_win(self, app, source):
+        with self.lock:
+            tally = self.wins.setdefault(app, {s: 0 for s in SOURCES})
+            tally[source] = tally.get(source, 0) + 1
+            self._save()
+
+    def preferred_source(self, app):
+        """Returns the source that has clearly won for this app, or None."""
+        tally = self.wins.get(app)
+        if not tally:
+            return None
+        best = max(SOURCES, key=lambda s: tally.get(s, 0))
+        others = max(tally.get(s, 0) for s in SOURCES if s != best)
+        if tally.get(best, 0) >= PREFER_AFTER_WINS and tally[best] > 2 * others:
+            return best
+        return None
+
+    def _run(self, source, text, stop):
+        start = time.time()
+        try:
+            found = self.finders[source](text, stop)
+        except Exception as e:
+            print(f"   ⚠️  [{source.upper()}] lookup error: {e}")
+            found = None
+        return source, found, time.time() - start
+
+    def race(self, text, sources=None):
+        """
+        Runs the given sources (all available ones by default) concurrently. Returns (source, point, seconds) or None.
+        A confident hit wins immediately; a weak hit is kept until every source has answered.
+        """
+        sources = sources or self.sources
+        stop = threading.Event()
+        pending = {self.pool.submit(self._run, s, text, stop) for s in sources}
+        fallback = None
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    source, found, took = future.result()
+                    if not found:
+                        continue
+                    point, confident = found
+                    if confident:
+                        return (source, point, took)
+                    fallback = fallback or (source, point, took)
+            return fallback
+        finally:
+            # Tell the loser to stop (AX checks this between nodes)
+            stop.set()
+
+    def resolve(self, text):
+        """Returns {"point": (x, y), "source": "ax"|"ocr", "app": ...} or None."""
+        app = self.tracker.frontmost_app()
+        preferred = self.preferred_source(app)
+        others = tuple(s for s in self.sources if s != preferred)
+
+        hit = None
+        if preferred in self.sources:
+            hit = self.race(text, sources=(preferred,))
+            if not hit and others:
+                hit = self.race(text, sources=others)
+        else:
+            hit = self.race(text)
+
+        if not hit:
+            return None
+        source, point, took = hit
+        print(f"   🏁 Resolved '{text}' via {source.upper()} in {took * 1000:.0f}ms ({app})")
+        self.record_win(app, source)
+        return {"point": point, "source": source, "app": app}
+
+    def click_text(self, text):
+        import pyautogui
+        screen = tuple(pyautogui.size())
+        info = self.tracker.get()
+
+        # 1. Learned location (verified by patch match)
+        point = self.locations.recall(info["app"], info["title"], text, screen)
+        if point:
+            print(f"   📌 '{text}' found at cached location {tuple(int(v) for v in point)}")
+        else:
+            # 2. Full search
+            hit = self.resolve(text)
+            if not hit:
+                return False
+            point = hit["point"]
+            if point[0] > screen[0] or point[1] > screen[1]:
+                print("WARNING: Off-screen match ignored.")
+                return False
+            # Capture the patch before the click changes the screen
+            self.locations.remember(info["app"], info["title"], text, screen, point)
+
+        x, y = point
+        pyautogui.moveTo(x, y, duration=0.5)
+        pyautogui.click()
+        return True
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+def get_resolver():
+    """Process-wide resolver so per-app win tallies accumulate."""
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = TargetResolver()
+        return _resolver
+
+if __name__ == "__main__":
+    # Test
+    print("Switch to screen in 5s...")
+    time.sleep(5)
+    get_resolver().click_text("Google Search")
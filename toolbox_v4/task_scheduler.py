@@ -0,0 +1,196 @@
+import os
+import sys
+import time
+import threading
+import itertools
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# --- CONFIGURATION ---
+# Goals planned concurrently (LLM calls); execution is always one at a time
+PLAN_WORKERS = int(os.getenv("TASK_PLAN_WORKERS", "3"))
+# Pending goals allowed per user before new ones are rejected
+MAX_QUEUE_PER_USER = int(os.getenv("TASK_MAX_QUEUE_PER_USER", "10"))
+
+
+class Task:
+    def __init__(self, task_id, user, goal):
+        self.id = task_id
+        self.user = user
+        self.goal = goal
+        self.status = "queued" # queued -> planning -> planned -> executing -> done | failed
+        self.plan = None
+        self.error = None
+        self.future = None
+        self.done = threading.Event()
+        self.times = {"queued": time.time()}
+
+    def __repr__(self):
+        return f"<Task {self.id} {self.user} {self.status} '{self.goal}'>"
+
+
+class ThreadRoutedStream:
+    """
+    sys.stdout replacement that sends each thread's writes to the stream routed
+    for that thread (redirect_stdout is process-wide, so it can't separate concurrent tasks).
+    Unrouted threads write to the fallback stream.
+    """
+    def __init__(self, fallback=None):
+        self.fallback = fallback or sys.__stdout__
+        self.local = threading.local()
+
+    def _target(self):
+        return getattr(self.local, "stream", None) or self.fallback
+
+    def route(self, stream):
+        """Context manager: this thread's prints go to `stream` inside the block."""
+        router = self
+        class _Route:
+            def __enter__(self):
+                self.previous = getattr(router.local, "stream", None)
+                router.local.stream = stream
+                return stream
+            def __exit__(self, *exc):
+                router.local.stream = self.previous
+        return _Route()
+
+    def write(self, message):
+        return self._target().write(message)
+
+    def flush(self):
+        self._target().flush()
+
+
+class TaskScheduler:
+    """
+    Runs remote goals with:
+    - per-user queues served round-robin (one busy user can't starve the others),
+    - a bounded pool that plans several goals at once,
+    - a single executor that holds the desktop lock, running tasks in dispatch order.
+    At most PLAN_WORKERS tasks are dispatched at once (the executing one included),
+    so the next goals are being planned while the current one drives the screen.
+    """
+    def __init__(self, plan, execute, workers=PLAN_WORKERS, max_queue_per_user=MAX_QUEUE_PER_USER):
+        self.plan_fn = plan
+        self.execute_fn = execute
+        self.workers = workers
+        self.max_queue_per_user = max_queue_per_user
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="planner")
+        self.desktop_lock = threading.Lock()
+        self.cond = threading.Condition()
+        self.queues = OrderedDict() # user -> deque of Tasks (round-robin order)
+        self.pipeline = deque() # dispatched Tasks awaiting / under execution
+        self.ids = itertools.count(1)
+        self.stopped = False
+        self.stats = {"submitted": 0, "rejected": 0, "done": 0, "failed": 0, "overlap_s": 0.0}
+
+        for target, name in ((self._dispatch_loop, "task-dispatch"), (self._execute_loop, "task-execute")):
+            t = threading.Thread(target=target, name=name)
+            t.daemon = True
+            t.start()
+
+    def submit(self, user, goal):
+        """Queues a goal for a user. Returns the Task, or None if that user's queue is full."""
+        with self.cond:
+            queue = self.queues.setdefault(user, deque())
+            if len(queue) >= self.max_queue_per_user:
+                self.stats["rejected"] += 1
+                return None
+            task = Task(next(self.ids), user, goal)
+            queue.append(task)
+            self.stats["submitted"] += 1
+            self.cond.notify_all()
+            return task
+
+    def _next_task(self):
+        """Round-robin: take from the first user with work, then move them to the back."""
+        for user in list(self.queues):
+            queue = self.queues[user]
+            if queue:
+                self.queues.move_to_end(user)
+                return queue.popleft()
+            del self.queues[user]
+        return None
+
+    def _dispatch_loop(self):
+        while True:
+            with self.cond:
+                while not self.stopped and (len(self.pipeline) >= self.workers or not any(self.queues.values())):
+                    self.cond.wait()
+                if self.stopped:
+                    return
+                task = self._next_task()
+                task.status = "planning"
+                task.times["dispatched"] = time.time()
+                task.future = self.pool.submit(self._plan, task)
+                self.pipeline.append(task)
+                self.cond.notify_all()
+
+    def _plan(self, task):
+        try:
+            task.plan = self.plan_fn(task)
+            task.status = "planned"
+        except Exception as e:
+            task.error = e
+            print(f"❌ Planning failed for task {task.id} ({task.user}): {e}")
+        task.times["planned"] = time.time()
+
+    def _execute_loop(self):
+        while True:
+            with self.cond:
+                while not self.stopped and not self.pipeline:
+                    self.cond.wait()
+                if self.stopped:
+                    return
+                task = self.pipeline[0]
+            task.future.result()
+
+            if task.error is None:
+                with self.desktop_lock:
+                    task.status = "executing"
+                    task.times["executing"] = time.time()
+                    try:
+                        self.execute_fn(task, task.plan)
+                    except Exception as e:
+                        task.error = e
+                        print(f"❌ Execution failed for task {task.id} ({task.user}): {e}")
+
+            task.times["finished"] = time.time()
+            task.status = "failed" if task.error else "done"
+            with self.cond:
+                self.pipeline.popleft()
+                self.stats["failed" if task.error else "done"] += 1
+                # Planning of later tasks that happened while this one held the desktop
+                if "executing" in task.times:
+                    for nxt in self.pipeline:
+                        start = max(nxt.times["dispatched"], task.times["executing"])
+                        end = min(nxt.times.get("planned", task.times["finished"]), task.times["finished"])
+                        self.stats["overlap_s"] += max(0.0, end - start)
+                self.cond.notify_all()
+            task.done.set()
+
+    def pending(self):
+        with self.cond:
+            return sum(len(q) for q in self.queues.values()) + len(self.pipeline)
+
+    def wait_idle(self, timeout=None):
+        """Blocks until every submitted task has finished (or timeout). Returns True if idle."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self.cond:
+            while any(self.queues.values()) or self.pipeline:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def shutdown(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        self.pool.shutdown(wait=False)
+
+    def summary(self):
+        s = self.stats
+        return (f"done {s['done']} | failed {s['failed']} | rejected {s['rejected']} | "
+                f"planning overlapped execution {s['overlap_s']:.1f}s")
@@ -0,0 +1,87 @@
+import time
+import threading
+import unittest
+import command_feed
+import dev_supabase_server
+
+try:
+    from supabase import create_client
+except ImportError:
+    create_client = None
+
+# Usage: python -m unittest test_command_feed  (runs against dev_supabase_server; no cloud project needed)
+
+KEY = "local.dev.key"
+USER = "agent@example.com"
+
+
+@unittest.skipIf(create_client is None, "supabase library not installed")
+class CommandFeedTest(unittest.TestCase):
+    def setUp(self):
+        self.server, self.store, self.url = dev_supabase_server.start_server(0)
+        self.feed = command_feed.CommandFeed(create_client(self.url, KEY), USER, url=self.url, key=KEY, mode="poll")
+        self.handled = []
+        self.handler_threads = set()
+
+    def tearDown(self):
+        self.feed.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, row):
+        self.handler_threads.add(threading.current_thread().name)
+        self.handled.append(row["command"])
+
+    def insert(self, command, **extra):
+        self.store.insert("agent_commands", [dict(user_email=USER, command=command, **extra)])
+
+    def test_skips_commands_issued_before_startup_and_other_users(self):
+        self.insert("OLD")
+        self.feed.fetch_latest_id()
+        self.insert("START")
+        self.store.insert("agent_commands", [{"user_email": "other@example.com", "command": "OTHER"}])
+        self.assertEqual(self.feed.poll_once(self.handle), 1)
+        self.assertTrue(self.feed.wait_handled(5))
+        self.assertEqual(self.handled, ["START"])
+
+    def test_row_committed_out_of_id_order_is_delivered_once(self):
+        self.insert("FIRST", id=10)
+        self.feed.poll_once(self.handle)
+        self.insert("LATE", id=9) # Its transaction committed after id 10 was seen
+        self.feed.poll_once(self.handle)
+        self.feed.poll_once(self.handle)
+        self.assertTrue(self.feed.wait_handled(5))
+        self.assertEqual(self.handled, ["FIRST", "LATE"])
+        self.assertEqual(self.feed.stats["late"], 1)
+
+    def test_handler_runs_on_its_own_thread(self):
+        release = threading.Event()
+        self.insert("SLOW")
+        self.feed.poll_once(lambda row: release.wait(5) and self.handle(row))
+        # The poll returned while the handler is still blocked
+        self.assertEqual(self.handled, [])
+        release.set()
+        self.assertTrue(self.feed.wait_handled(5))
+        self.assertEqual((self.handled, self.handler_threads), (["SLOW"], {"command-handler"}))
+
+    def test_falls_back_to_polling_when_realtime_is_unavailable(self):
+        saved = command_feed.REALTIME_CONNECT_TIMEOUT, command_feed.POLL_MIN_INTERVAL
+        command_feed.REALTIME_CONNECT_TIMEOUT, command_feed.POLL_MIN_INTERVAL = 1.0, 0.05
+        try:
+            self.feed.mode = "auto" # The dev server doesn't serve Realtime
+            t = threading.Thread(target=self.feed.run, args=(self.handle,))
+            t.daemon = True
+            t.start()
+            self.insert("START")
+            deadline = time.time() + 10
+            while not self.handled and time.time() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(self.handled, ["START"])
+            self.assertEqual(self.feed.stats["fallbacks"], 1)
+            self.assertEqual(self.feed.stats["polled"], 1)
+        finally:
+            command_feed.REALTIME_CONNECT_TIMEOUT, command_feed.POLL_MIN_INTERVAL = saved
+
+
+if __name__ == "__main__":
+    unittest.main()
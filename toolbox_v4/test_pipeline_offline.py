@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import mock_groq_server
+
+# Usage: python -m unittest test_pipeline_offline  (no network or API key: runs against mock_groq_server)
+
+MAX_CONCURRENCY = 2
+server = book = workdir = None
+
+
+def setUpModule():
+    global server, book, workdir, groq_brain, async_brain, agent_compiler
+    server, book, url = mock_groq_server.start_server(0, latency_scale=0)
+    os.environ.update(GROQ_BASE_URL=url, GROQ_API_KEY="offline", GROQ_ASYNC="1", SUPABASE_URL="",
+                      GROQ_MAX_CONCURRENCY=str(MAX_CONCURRENCY), GROQ_RPM="100000", GROQ_BURST="100")
+    # The pipeline writes stage files, logs and its local toolbox to the working directory
+    workdir = tempfile.mkdtemp(prefix="test_pipeline_")
+    os.chdir(workdir)
+    import groq_brain, async_brain, agent_compiler # Read the environment at import time
+
+
+def tearDownModule():
+    server.shutdown()
+    agent_compiler.model_router.get_router().flush() # Before its file's directory goes away
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+class OfflinePipelineTest(unittest.TestCase):
+    def setUp(self):
+        book.latency_scale = 0
+        book.reset_stats()
+
+    def test_stages_1_to_4_return_the_fixture_answers(self):
+        compiler = agent_compiler.AgentCompiler()
+        compiler.db.save_tool("open_browser", "Opens a web browser", ["browser"],
+                              [{"action": "open_app", "name": "{browser}"}, {"action": "wait", "seconds": 5}])
+        goal = "search Nvidia stock price on google and save the price in notes"
+
+        self.assertEqual(compiler.stage_1_main_breakdown(goal),
+                         ["Open Browser", "Search for Nvidia", "Extract Price", "Save to Notes"])
+        self.assertIn("nvidia", compiler.stage_2_semantic_search(goal))
+        self.assertIn("open_browser", [t["name"] for t in compiler.stage_3_available_tools()])
+
+        streamed = []
+        plan = compiler.stage_4_final_execution(goal, on_step=streamed.append)
+        self.assertEqual(len(streamed), 7) # Raw steps, before expansion
+        self.assertEqual(plan[0], {"action": "open_app", "name": "Brave"}) # call_tool expanded
+        self.assertNotIn("call_tool", [step.get("action") for step in plan])
+
+        hits = {f["name"]: f["hits"] for f in book.fixtures}
+        self.assertEqual((hits["stage_1"], hits["stage_2"], hits["stage_4"]), (1, 1, 1))
+
+        # Stage 3's tools are re-read from disk: same content, same expander (and cache)
+        expander = compiler.expander
+        self.assertEqual(compiler.stage_4_final_execution(goal), plan)
+        self.assertIs(compiler.expander, expander)
+        self.assertEqual(book.unmatched, 0)
+
+    def test_concurrent_requests_stay_within_the_client_limit(self):
+        book.latency_scale = 0.2 # Slow enough for requests to overlap
+        threads = [threading.Thread(target=groq_brain.get_action_plan, args=(f"User Goal: goal {i}",))
+                   for i in range(MAX_CONCURRENCY * 3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(async_brain.GROQ_MAX_CONCURRENCY, MAX_CONCURRENCY)
+        self.assertEqual(book.requests, len(threads))
+        self.assertGreater(book.peak_inflight, 1)
+        self.assertLessEqual(book.peak_inflight, MAX_CONCURRENCY)
+
+
+if __name__ == "__main__":
+    unittest.main()
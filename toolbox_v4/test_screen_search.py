@@ -0,0 +1,137 @@
+import os
+import unittest
+from types import SimpleNamespace
+import screen_search
+
+# Usage: python -m unittest test_screen_search  (no desktop or D-Bus needed)
+
+SHOWING, ACTIVE = "showing", "active"
+
+
+class FakeStates:
+    def __init__(self, *states):
+        self.states = set(states)
+
+    def contains(self, state):
+        return state in self.states
+
+
+class FakeAccessible:
+    """Mimics the libatspi getters AtspiTreeProvider calls."""
+    def __init__(self, name, role, extents=(0, 0, 10, 10), children=(), states=(SHOWING,), text=None,
+                 description="", pid=1234):
+        self.name, self.role, self.description, self.text, self.pid = name, role, description, text, pid
+        self.extents = SimpleNamespace(x=extents[0], y=extents[1], width=extents[2], height=extents[3])
+        self.children = list(children)
+        self.states = FakeStates(*states)
+
+    def get_name(self): return self.name
+    def get_role_name(self): return self.role
+    def get_description(self): return self.description
+    def get_child_count(self): return len(self.children)
+    def get_child_at_index(self, i): return self.children[i]
+    def get_state_set(self): return self.states
+    def get_extents(self, coord_type): return self.extents
+    def get_process_id(self): return self.pid
+
+
+def fake_atspi(desktop):
+    return SimpleNamespace(
+        StateType=SimpleNamespace(SHOWING=SHOWING, ACTIVE=ACTIVE),
+        CoordType=SimpleNamespace(SCREEN="screen"),
+        Text=SimpleNamespace(get_character_count=lambda acc: len(acc.text or ""),
+                             get_text=lambda acc, start, end: (acc.text or "")[start:end]),
+        get_desktop=lambda i: desktop,
+    )
+
+
+class FixedScreenAtspiProvider(screen_search.AtspiTreeProvider):
+    def screen_size(self):
+        return (1440, 900)
+
+
+class FixedTracker:
+    generation = 1
+
+    def get(self):
+        return None
+
+
+class AtspiTreeProviderTest(unittest.TestCase):
+    def setUp(self):
+        self.send = FakeAccessible("Send", "push button", (400, 300, 80, 30))
+        self.entry = FakeAccessible("", "entry", (100, 300, 280, 30), text="hello")
+        self.price = FakeAccessible("NVDA 182.45", "label", (100, 200, 120, 20))
+        self.hidden = FakeAccessible("Hidden panel", "panel", (0, 0, 500, 500), states=(),
+                                     children=[FakeAccessible("Send", "push button", (10, 10, 80, 30))])
+        chat_window = FakeAccessible("Chat", "frame", (0, 0, 1440, 900), states=(SHOWING, ACTIVE),
+                                     children=[self.hidden, self.entry, self.price, self.send])
+        self.chat = FakeAccessible("Chat", "application", children=[chat_window])
+        self.files = FakeAccessible("Files", "application",
+                                    children=[FakeAccessible("Files", "frame", (0, 0, 800, 600))])
+        own_hud = FakeAccessible("HUD", "application", pid=os.getpid())
+        desktop = FakeAccessible("desktop", "desktop frame", children=[self.files, own_hud, self.chat])
+
+        self.saved = getattr(screen_search, "Atspi", None)
+        screen_search.Atspi = fake_atspi(desktop)
+        self.provider = FixedScreenAtspiProvider()
+
+    def tearDown(self):
+        if self.saved is None:
+            del screen_search.Atspi
+        else:
+            screen_search.Atspi = self.saved
+
+    def test_list_apps_puts_active_app_first_and_skips_own_process(self):
+        names = [name for name, _ in self.provider.list_apps()]
+        self.assertEqual(names, ["Chat", "Files"])
+
+    def test_read_node_maps_roles_and_reads_text_values(self):
+        title, desc, value, role, children, frame = self.provider.read_node(self.send)
+        self.assertEqual((title, role, frame), ("Send", "AXButton", (400, 300, 80, 30)))
+        self.assertEqual(self.provider.read_node(self.entry)[2:4], ("hello", "AXTextField"))
+
+    def test_labels_read_their_text_from_the_name(self):
+        self.assertEqual(self.provider.read_node(self.price)[2:4], ("NVDA 182.45", "AXStaticText"))
+        scanner = screen_search.ScreenScanner(provider=self.provider, tracker=FixedTracker(), workers=2)
+        result = scanner.find("nvda 182.45")
+        self.assertIsNotNone(result)
+        self.assertEqual(result["frame"], (100, 200, 120, 20))
+
+    def test_hidden_nodes_report_zero_size(self):
+        self.assertEqual(self.provider.read_node(self.hidden)[5], (0, 0, 0, 0))
+        self.assertGreater(self.provider.ipc_calls, 0)
+
+    def test_scanner_finds_visible_button_and_prunes_hidden_subtree(self):
+        scanner = screen_search.ScreenScanner(provider=self.provider, tracker=FixedTracker(), workers=2)
+        result = scanner.find("send")
+        self.assertIsNotNone(result)
+        self.assertEqual((result["app"], result["frame"]), ("Chat", (400, 300, 80, 30)))
+        self.assertEqual(len(scanner.find_all("send")), 1) # The hidden copy never got indexed
+        self.assertGreaterEqual(scanner.snapshot.pruned, 1)
+
+
+def fake_app(name, buttons):
+    items = [{"title": f"{name} item {i}", "role": "AXButton", "frame": (10, 10 + 20 * i, 80, 18)} for i in range(buttons)]
+    return (name, {"title": name, "role": "AXWindow", "frame": (0, 0, 800, 600), "children": items})
+
+
+class ScannerBudgetTest(unittest.TestCase):
+    def test_node_budget_is_shared_across_apps(self):
+        provider = screen_search.FakeTreeProvider([fake_app(f"App {i}", 30) for i in range(3)])
+        scanner = screen_search.ScreenScanner(provider=provider, tracker=FixedTracker(), node_budget=20, workers=3)
+        snapshot = scanner.build_snapshot()
+        self.assertEqual(scanner.expand(snapshot, target="missing"), 20)
+        self.assertEqual(snapshot.visited, 20)
+        # The next lookup resumes from the frontier with a fresh budget
+        self.assertEqual(scanner.expand(snapshot, target="missing"), 20)
+
+
+class TreeProviderTest(unittest.TestCase):
+    def test_base_class_is_abstract(self):
+        with self.assertRaises(TypeError):
+            screen_search.TreeProvider()
+
+
+if __name__ == "__main__":
+    unittest.main()
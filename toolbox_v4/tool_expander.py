@@ -0,0 +1,223 @@
+import re
+import json
+import time
+import hashlib
+
+# --- CONFIGURATION ---
+# Nested call_tool levels allowed before expansion stops
+MAX_TOOL_DEPTH = 10
+
+# Any {name} (hyphens, spaces allowed); names without a matching param stay literal
+PLACEHOLDER = re.compile(r"\{([^{}]+)\}")
+
+
+def compile_template(node):
+    """
+    Pre-compiles a tool body into a render tree. Strings with {param} slots become
+    ("fmt", parts) where parts alternate literal text and slot names; everything
+    else is kept as-is, so rendering never goes through json.dumps/loads.
+    """
+    if isinstance(node, dict):
+        return ("dict", [(compile_template(k), compile_template(v)) for k, v in node.items()])
+    if isinstance(node, list):
+        return ("list", [compile_template(v) for v in node])
+    if isinstance(node, str) and PLACEHOLDER.search(node):
+        return ("fmt", PLACEHOLDER.split(node)) # [text, slot, text, slot, text...]
+    return ("const", node)
+
+
+def render(template, params):
+    """Fills a compiled template. Slots without a matching param keep their {placeholder}."""
+    kind, data = template
+    if kind == "const":
+        return data
+    if kind == "fmt":
+        out = []
+        for i, part in enumerate(data):
+            if i % 2 == 0:
+                out.append(part)
+            elif part in params:
+                out.append(str(params[part]))
+            else:
+                out.append("{" + part + "}")
+        return "".join(out)
+    if kind == "dict":
+        return {render(k, params): render(v, params) for k, v in data}
+    return [render(v, params) for v in data]
+
+
+def tools_fingerprint(tools_list):
+    """Content hash of a tool list (names, params, bodies); equal lists give equal keys in any order."""
+    tools = sorted(tools_list or [], key=lambda t: str(t.get("name")))
+    return hashlib.sha1(json.dumps(tools, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _clone(node):
+    """Cheap structural copy so callers can't mutate cached expansions."""
+    if isinstance(node, dict):
+        return {k: _clone(v) for k, v in node.items()}
+    if isinstance(node, list):
+        return [_clone(v) for v in node]
+    return node
+
+
+class ToolExpander:
+    """
+    Flattens call_tool steps into primitive actions.
+    - Tool bodies are compiled once into templates with parameter slots.
+    - Expansions are cached by (tool, params).
+    - Expansion is iterative (explicit stack) with a depth limit and cycle
+      detection; offending call_tool steps are left in place with a warning.
+    """
+    def __init__(self, tools_list, max_depth=MAX_TOOL_DEPTH):
+        self.tools = {t["name"]: t for t in tools_list or [] if isinstance(t, dict) and "name" in t}
+        self.max_depth = max_depth
+        self.templates = {}
+        self.cache = {}
+        self.last_report = {}
+
+    def template(self, tool_name):
+        if tool_name not in self.templates:
+            self.templates[tool_name] = compile_template(self.tools[tool_name].get("body") or [])
+        return self.templates[tool_name]
+
+    @staticmethod
+    def call_info(step):
+        # Be flexible: check 'name' or 'tool'
+        return step.get("name") or step.get("tool"), step.get("params") or {}
+
+    @staticmethod
+    def cache_key(tool_name, params):
+        return tool_name + "|" + json.dumps(params, sort_keys=True, default=str)
+
+    def can_expand(self, tool_name, chain=()):
+        """False (with a warning) for unknown tools, cycles and over-deep nesting."""
+        if tool_name not in self.tools:
+            print(f"   ⚠️  Warning: Tool '{tool_name}' not found in available tools list.")
+            return False
+        if tool_name in chain:
+            print(f"   ⚠️  Warning: Tool cycle {' -> '.join(chain + (tool_name,))}; leaving call in place.")
+            return False
+        if len(chain) >= self.max_depth:
+            print(f"   ⚠️  Warning: Tool nesting deeper than {self.max_depth} at '{tool_name}'; leaving call in place.")
+            return False
+        return True
+
+    def render_body(self, tool_name, params):
+        body = render(self.template(tool_name), params)
+        return body if isinstance(body, list) else [body]
+
+    def expand_call(self, step, chain=()):
+        """
+        Expands one call_tool step. Returns (steps, ok); ok is False when something
+        (unknown tool, cycle, depth) was left unexpanded inside.
+        """
+        tool_name, params = self.call_info(step)
+        if not self.can_expand(tool_name, chain):
+            return [step], False
+
+        key = self.cache_key(tool_name, params)
+        if key in self.cache:
+            self.last_report["cache_hits"] = self.last_report.get("cache_hits", 0) + 1
+            return _clone(self.cache[key]), True
+
+        self.last_report["calls"] = self.last_report.get("calls", 0) + 1
+        self.last_report["max_depth"] = max(self.last_report.get("max_depth", 0), len(chain) + 1)
+        return self.render_body(tool_name, params), None
+
+    def iter_steps(self, plan):
+        """
+        Lazy expansion: yields (path, primitive_step) one at a time, rendering a tool body
+        only when execution reaches it. path[0] is the index in `plan`; later entries index
+        into nested tool bodies. Calls that can't be expanded are yielded as-is.
+        """
+        if not isinstance(plan, list): return
+        stack = [[plan, 0, (), ()]] # [steps, position, tool chain, path]
+        while stack:
+            frame = stack[-1]
+            steps, pos, chain, path = frame
+            if pos == len(steps):
+                stack.pop()
+                continue
+
+            frame[1] += 1
+            step = steps[pos]
+            if not isinstance(step, dict): continue
+            if step.get("action") == "call_tool":
+                tool_name, params = self.call_info(step)
+                if self.can_expand(tool_name, chain):
+                    stack.append([self.render_body(tool_name, params), 0, chain + (tool_name,), path + (pos,)])
+                    continue
+            yield path + (pos,), step
+
+    def expand(self, plan):
+        """Returns the fully flattened plan. Report is left in self.last_report."""
+        if not isinstance(plan, list): return []
+        start = time.perf_counter()
+        self.last_report = {"calls": 0, "cache_hits": 0, "max_depth": 0}
+
+        # Each frame: [steps, position, output, key, chain, ok]
+        root = [plan, 0, [], None, (), True]
+        stack = [root]
+        while stack:
+            frame = stack[-1]
+            steps, pos, out, key, chain, _ = frame
+            if pos == len(steps):
+                stack.pop()
+                if key is not None and frame[5]:
+                    self.cache[key] = _clone(out)
+                if stack:
+                    parent = stack[-1]
+                    parent[2].extend(out)
+                    parent[5] = parent[5] and frame[5]
+                continue
+
+            frame[1] += 1
+            step = steps[pos]
+            if not isinstance(step, dict): continue
+            if step.get("action") != "call_tool":
+                out.append(step)
+                continue
+
+            expanded, ok = self.expand_call(step, chain)
+            if ok is None:
+                # Fresh body: walk it as a new frame (its own call_tools expand there)
+                tool_name, params = self.call_info(step)
+                stack.append([expanded, 0, [], self.cache_key(tool_name, params), chain + (tool_name,), True])
+            else:
+                out.extend(expanded)
+                frame[5] = frame[5] and ok
+
+        self.last_report["steps_in"] = len(plan)
+        self.last_report["steps_out"] = len(root[2])
+        self.last_report["micros"] = (time.perf_counter() - start) * 1e6
+        return root[2]
+
+    def report_line(self):
+        r = self.last_report
+        return (f"{r.get('steps_in', 0)} -> {r.get('steps_out', 0)} steps | {r.get('calls', 0)} calls "
+                f"| {r.get('cache_hits', 0)} cache hits | depth {r.get('max_depth', 0)} | {r.get('micros', 0):.0f}µs")
+
+
+if __name__ == "__main__":
+    # Benchmark: 4 levels of nesting, each tool calling the next twice
+    tools = [{"name": "leaf", "body": [
+        {"action": "click_text", "text": "{label}"},
+        {"action": "type_text", "text": "value {label} for {query}"}
+    ]}]
+    for level in range(1, 5):
+        tools.append({"name": f"tool_{level}", "body": [
+            {"action": "call_tool", "name": tools[-1]["name"], "params": {"label": "{label}-a", "query": "{query}"}},
+            {"action": "call_tool", "name": tools[-1]["name"], "params": {"label": "{label}-b", "query": "{query}"}},
+            {"action": "wait", "seconds": 1}
+        ]})
+    tools.append({"name": "loop", "body": [{"action": "call_tool", "name": "loop"}]})
+
+    plan = [{"action": "call_tool", "name": "tool_4", "params": {"label": "x", "query": "nvidia"}}] * 3
+    expander = ToolExpander(tools)
+    expander.expand(plan)
+    print(f"🔧 Cold: {expander.report_line()}")
+    expander.expand(plan)
+    print(f"🔧 Warm: {expander.report_line()}")
+    expander.expand([{"action": "call_tool", "name": "loop"}])
+    print(f"🔧 Cycle: {expander.report_line()}")
@@ -13,6 +13,7 @@ except ImportError:
 load_dotenv()
 
 MEMORY_FILE = "toolbox_memory.json"
+ICON_MEMORY_FILE = "icon_memory.json"
 
 class ToolboxDB:
     def __init__(self):
@@ -34,16 +35,20 @@ class ToolboxDB:
         if not self.use_cloud:
             print("   📂 Using Local Memory (toolbox_memory.json)")
             self.local_data = self._load_local()
+            self.local_icons = self._load_local(ICON_MEMORY_FILE)
 
-    def _load_local(self):
-        if not os.path.exists(MEMORY_FILE): return []
+    def _load_local(self, path=MEMORY_FILE):
+        if not os.path.exists(path): return []
         try:
-            with open(MEMORY_FILE, 'r') as f: return json.load(f)
+            with open(path, 'r') as f: return json.load(f)
         except: return []
 
     def _save_local(self):
         with open(MEMORY_FILE, 'w') as f: json.dump(self.local_data, f, indent=2)
 
+    def _save_local_icons(self):
+        with open(ICON_MEMORY_FILE, 'w') as f: json.dump(self.local_icons, f, indent=2)
+
     def get_all_tools(self):
         """Returns a list of available tool definitions (name, description, params)."""
         if self.use_cloud:
@@ -149,3 +154,51 @@ class ToolboxDB:
             self.local_data.append(entry)
             self._save_local()
             print(f"   💾 Saved Tool Locally: '{name}'")
+
+    # --- ICON LIBRARY (templates for click_image) ---
+
+    def list_icons(self):
+        """Returns [{"name", "description"}] for every stored icon template."""
+        if self.use_cloud:
+            try:
+                response = self.supabase.table("icons").select("name, description").execute()
+                return response.data
+            except:
+                return []
+        return [{"name": i["name"], "description": i.get("description", "")} for i in self.local_icons]
+
+    def get_icon(self, name):
+        """Returns the base64 PNG template for an icon, or None."""
+        if self.use_cloud:
+            try:
+                response = self.supabase.table("icons").select("image").eq("name", name).execute()
+                if response.data:
+                    return response.data[0]["image"]
+            except:
+                pass
+        else:
+            for icon in self.local_icons:
+                if icon["name"] == name:
+                    return icon["image"]
+        return None
+
+    def save_icon(self, name, image_b64, description=""):
+        """Saves an icon template (base64 PNG) next to the tools."""
+        entry = {
+            "name": name,
+            "description": description,
+            "image": image_b64,
+            "timestamp": time.time()
+        }
+
+        if self.use_cloud:
+            try:
+                self.supabase.table("icons").upsert(entry, on_conflict="name").execute()
+                print(f"   ☁️  Saved Icon: '{name}'")
+            except Exception as e:
+                print(f"   ❌ Cloud Icon Save Failed: {e}")
+        else:
+            self.local_icons = [i for i in self.local_icons if i["name"] != name]
+            self.local_icons.append(entry)
+            self._save_local_icons()
+            print(f"   💾 Saved Icon Locally: '{name}'")
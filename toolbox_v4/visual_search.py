@@ -4,7 +4,11 @@ from PIL import Image
 import time
 import window_utils # NEW: Import our exclusion logic
 
-def visual_find_and_click(target_text):
+def visual_find(target_text):
+    """
+    OCR lookup without clicking.
+    Returns {"point": (x, y), "conf": 0-100} for the first match outside exclusion zones, or None.
+    """
     print(f"[Visual] Taking screenshot to find '{target_text}'...")
     
     # Get exclusion zones (HUD, Terminal)
@@ -13,9 +17,15 @@ def visual_find_and_click(target_text):
     # 1. Take Screenshot
     screenshot = pyautogui.screenshot()
     
-    # 2. Run OCR (Get Data with Boxes)
+    # Retina Scaling Correction
+    screen_w, _ = pyautogui.size()
+    img_w = screenshot.width
+    scale = img_w / screen_w
+
+    # 2. Run OCR (Get Data with Boxes) with the HUD/Terminal painted out
     print("[Visual] Analyzing text...")
-    data = pytesseract.image_to_data(screenshot, output_type=pytesseract.Output.DICT)
+    ocr_image = window_utils.mask_exclusions(screenshot, exclusion_rects, scale)
+    data = pytesseract.image_to_data(ocr_image, output_type=pytesseract.Output.DICT)
     
     # DEBUG: Print raw OCR to terminal
     raw_ocr_words = [w.strip() for w in data['text'] if w.strip()]
@@ -23,11 +33,7 @@ def visual_find_and_click(target_text):
 
     target_words = target_text.lower().split()
     n_boxes = len(data['text'])
-    
-    # Retina Scaling Correction
-    screen_w, _ = pyautogui.size()
-    img_w = screenshot.width
-    scale = img_w / screen_w
+    candidates = []
 
     # Sliding window search for multi-word targets
     for i in range(n_boxes - len(target_words) + 1):
@@ -35,6 +41,7 @@ def visual_find_and_click(target_text):
         total_x = 0
         total_y = 0
         count = 0
+        confs = []
         
         for j in range(len(target_words)):
             word_index = i + j
@@ -50,27 +57,36 @@ def visual_find_and_click(target_text):
             total_x += x
             total_y += y
             count += 1
+            confs.append(float(data['conf'][word_index]))
             
         if match_found and count > 0:
             center_x = total_x / count
             center_y = total_y / count
             
-            # --- NEW: EXCLUSION CHECK ---
-            if window_utils.is_point_in_rects(center_x, center_y, exclusion_rects):
-                continue
-            
             # FILTER: Ignore the very top of the screen (Menubar)
             if center_y < 30:
                 continue
             
-            print(f"[Visual] Found multi-word match '{target_text}' at ({center_x}, {center_y})")
-            
-            pyautogui.moveTo(center_x, center_y, duration=0.5)
-            pyautogui.click()
-            return True
+            candidates.append(((center_x, center_y), min(confs)))
+
+    # --- EXCLUSION CHECK (vectorized over all candidates) ---
+    keep = window_utils.points_outside_rects([p for p, _ in candidates], exclusion_rects)
+    for (point, conf), k in zip(candidates, keep):
+        if k:
+            print(f"[Visual] Found multi-word match '{target_text}' at ({point[0]}, {point[1]})")
+            return {"point": point, "conf": conf}
             
     print(f"[Visual] Could not find text '{target_text}' outside exclusion zones.")
-    return False
+    return None
+
+def visual_find_and_click(target_text):
+    match = visual_find(target_text)
+    if not match:
+        return False
+    center_x, center_y = match["point"]
+    pyautogui.moveTo(center_x, center_y, duration=0.5)
+    pyautogui.click()
+    return True
 
 if __name__ == "__main__":
     print("--- VISUAL SEARCH TEST ---")
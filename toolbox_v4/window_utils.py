@@ -1,8 +1,17 @@
 import os
 import sys
+import time
+import threading
 import subprocess
+import focus_tracker
 
-def get_exclusion_rects():
+# Exclusion rects are reused until focus changes or this many seconds pass
+EXCLUSION_TTL = float(os.getenv("EXCLUSION_TTL", "2.0"))
+
+_cache = {"rects": None, "fetched_at": 0.0, "generation": None}
+_cache_lock = threading.Lock()
+
+def _query_exclusion_rects():
     """
     Returns a list of (x, y, w, h) rectangles for windows that should be ignored by OCR.
     Currently targets: The Python HUD and the Terminal (iTerm2/Terminal.app).
@@ -38,6 +47,31 @@ def get_exclusion_rects():
             
     return rects
 
+def get_exclusion_rects(max_age=None):
+    """
+    Cached version of the window query. Re-queried when the frontmost app/window
+    changes (FocusTracker generation) or after EXCLUSION_TTL seconds.
+    """
+    max_age = EXCLUSION_TTL if max_age is None else max_age
+    tracker = focus_tracker.get_tracker()
+    tracker.get()
+    with _cache_lock:
+        stale = (
+            _cache["rects"] is None
+            or time.time() - _cache["fetched_at"] > max_age
+            or _cache["generation"] != tracker.generation
+        )
+        if stale:
+            _cache["rects"] = _query_exclusion_rects()
+            _cache["fetched_at"] = time.time()
+            _cache["generation"] = tracker.generation
+        return list(_cache["rects"])
+
+def invalidate_exclusion_rects():
+    """Call after moving/resizing the HUD."""
+    with _cache_lock:
+        _cache["rects"] = None
+
 def is_point_in_rects(x, y, rects):
     """Checks if a coordinate (x, y) falls inside any of the exclusion rectangles."""
     for (rx, ry, rw, rh) in rects:
@@ -45,6 +79,34 @@ def is_point_in_rects(x, y, rects):
             return True
     return False
 
+def points_outside_rects(points, rects):
+    """
+    Vectorized exclusion check. Returns a boolean NumPy mask (True = keep)
+    for an (N, 2) sequence of (x, y) points against all rects at once.
+    """
+    import numpy as np
+    pts = np.asarray(points, dtype=float).reshape(-1, 2)
+    if not len(rects) or not len(pts):
+        return np.ones(len(pts), dtype=bool)
+    r = np.asarray(rects, dtype=float)
+    x, y = pts[:, 0:1], pts[:, 1:2]
+    inside = (x >= r[:, 0]) & (x <= r[:, 0] + r[:, 2]) & (y >= r[:, 1]) & (y <= r[:, 1] + r[:, 3])
+    return ~inside.any(axis=1)
+
+def mask_exclusions(screenshot, rects, scale=1.0, fill="white"):
+    """
+    Returns a copy of the screenshot with exclusion rects painted over, so OCR
+    never reads the HUD/Terminal. `scale` = screenshot pixels per screen point.
+    """
+    if not rects:
+        return screenshot
+    from PIL import ImageDraw
+    masked = screenshot.copy()
+    draw = ImageDraw.Draw(masked)
+    for (rx, ry, rw, rh) in rects:
+        draw.rectangle([rx * scale, ry * scale, (rx + rw) * scale, (ry + rh) * scale], fill=fill)
+    return masked
+
 if __name__ == "__main__":
     # Test: Print exclusion zones
     r = get_exclusion_rects()